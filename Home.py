@@ -9,12 +9,16 @@ import streamlit as st
 
 from src.utils.environment import initialize_environment
 from src.utils.logger import setup_logger
+from src.utils.profiling import profile_page
+from src.utils.session_state import track_session
 
 # ------------------------------------------------------------------------
 # Initialization
 # ------------------------------------------------------------------------
 # Initialize environment and logging
+profile_page("home")
 initialize_environment()
+track_session()
 logger = setup_logger("home")
 
 # ------------------------------------------------------------------------
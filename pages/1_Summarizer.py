@@ -9,16 +9,23 @@ for text summarization tasks.
 import streamlit as st
 
 from src.miscs.disclaimer import show_disclaimer_dialog
+from src.models.benchmark import RunMetrics, get_benchmark_history, measure_stream
+from src.models.circuit_breaker import get_circuit_breakers
 from src.models.llm import create_llm_service
 from src.utils.environment import initialize_environment
+from src.utils.jobs import get_job_manager
 from src.utils.load import load_config
 from src.utils.logger import setup_logger
+from src.utils.profiling import profile_fragment, profile_page
+from src.utils.session_state import persist_session, track_session
 
 # ------------------------------------------------------------------------
 # Initialization and Configuration
 # ------------------------------------------------------------------------
 # Initialize environment and logging
+profile_page("summarizer")
 initialize_environment()
+track_session()
 logger = setup_logger("summarizer")
 
 # Configure page
@@ -30,89 +37,361 @@ if "page_1_messages" not in st.session_state:
     st.session_state.page_1_messages = []
 
 # ------------------------------------------------------------------------
-# Model Selection Section
+# Model Selection and System Instructions Section
 # ------------------------------------------------------------------------
-# Initialize session state for provider selection
+# Settings live in their own fragment so changing them only reruns this
+# section; the chat fragment reads the current values from widget keys.
+# Initialize session state for provider and model selection
 if "previous_provider" not in st.session_state:
     st.session_state.previous_provider = None
 
-# Provider dropdown
-selected_provider = st.selectbox(
-    "Select Provider",
-    options=[key.upper() for key in st.session_state.model_config.keys()],
-    help="Choose the AI provider for text summarization",
-)
-
-# Log provider changes
-if selected_provider != st.session_state.previous_provider:
-    logger.info(f"Selected provider: {selected_provider}")
-    st.session_state.previous_provider = selected_provider
-
-# Initialize session state for model selection
 if "previous_model" not in st.session_state:
     st.session_state.previous_model = None
 
-# Model dropdown
-model_options = st.session_state.model_config[selected_provider].get("model", None)
-selected_model = st.selectbox(
-    "Select Model",
-    options=model_options,
-    help="Choose the specific model for summarization",
+# Compare mode fans the same text out to several models at once
+compare_mode = st.toggle(
+    "Compare models",
+    help="Summarize with several models side by side and measure their speed",
+    key="page_1_compare_mode",
 )
+max_pairs = st.session_state.runtime_config.get("benchmark", {}).get("max_pairs", 4)
 
-# Log model changes
-if selected_model != st.session_state.previous_model:
-    logger.info(f"Selected model: {selected_model}")
-    st.session_state.previous_model = selected_model
 
-# ------------------------------------------------------------------------
-# System Instructions Section
-# ------------------------------------------------------------------------
-sys_instr = st.text_area(
-    "System Instructions",
-    height=250,
-    value=st.session_state.instructions_config["summarizer"].get("sys_prompt", ""),
-    help="Customize the instructions given to the AI model",
-)
+def model_pairs() -> list[str]:
+    """All provider/model pairs from the model configuration."""
+    return [
+        f"{provider} / {model}"
+        for provider, config in st.session_state.model_config.items()
+        for model in config.get("model", [])
+    ]
+
+
+@st.fragment
+def model_settings() -> None:
+    """Display the provider, model and system instruction inputs."""
+    profile_fragment("summarizer.model_settings")
+    if compare_mode:
+        st.multiselect(
+            "Select Models to Compare",
+            options=model_pairs(),
+            max_selections=max_pairs,
+            help="Each selected model summarizes the same text concurrently",
+            key="page_1_compare_pairs",
+        )
+    else:
+        provider_settings()
+
+    st.text_area(
+        "System Instructions",
+        height=250,
+        value=st.session_state.instructions_config["summarizer"].get(
+            "sys_prompt", ""
+        ),
+        help="Customize the instructions given to the AI model",
+        key="page_1_sys_instr",
+    )
+
+
+def provider_settings() -> None:
+    """Display the provider and model dropdowns."""
+    # Provider dropdown
+    selected_provider = st.selectbox(
+        "Select Provider",
+        options=[key.upper() for key in st.session_state.model_config.keys()],
+        help="Choose the AI provider for text summarization",
+        key="page_1_provider",
+    )
+
+    # Log provider changes
+    if selected_provider != st.session_state.previous_provider:
+        logger.info(f"Selected provider: {selected_provider}")
+        st.session_state.previous_provider = selected_provider
+
+    # Model dropdown
+    model_options = st.session_state.model_config[selected_provider].get(
+        "model", None
+    )
+    selected_model = st.selectbox(
+        "Select Model",
+        options=model_options,
+        help="Choose the specific model for summarization",
+        key="page_1_model",
+    )
+
+    # Log model changes
+    if selected_model != st.session_state.previous_model:
+        logger.info(f"Selected model: {selected_model}")
+        st.session_state.previous_model = selected_model
+
+
+model_settings()
 
 # ------------------------------------------------------------------------
 # Text Input and Summarization Section
 # ------------------------------------------------------------------------
+# Summaries are streamed from a background job so a long summarization
+# survives reruns and navigation. Submitting text only reruns the chat
+# fragment, and a nested fragment polls the job while one is attached. The
+# finished history is drawn once by the chat fragment; polls only redraw the
+# exchange in progress, so their cost does not grow with the history.
+job_manager = get_job_manager()
+session_id = st.session_state.session_id
+thread_id = "summarizer"
+
+if "page_1_job_cursor" not in st.session_state:
+    st.session_state.page_1_job_cursor = 0
+
 
-# Text input and processing
-if prompt := st.chat_input("Enter text to summarize..."):
+def submit_summary(prompt: str) -> None:
+    """Submit a summarization job for the current model settings."""
     logger.info("Received text for summarization")
+    running_job = job_manager.get(session_id, thread_id)
+    if running_job is not None and not running_job.finished:
+        st.warning("Still summarizing your previous text. Please wait.")
+        return
+
     try:
-        # Get provider configuration and run summarization
-        provider = st.session_state.model_config[selected_provider].get(
-            "model_provider", None
-        )
+        # Get provider configuration and run summarization in the background
+        selected_model = st.session_state.page_1_model
+        provider = st.session_state.model_config[
+            st.session_state.page_1_provider
+        ].get("model_provider", None)
         logger.debug(f"Using provider: {provider} with model: {selected_model}")
 
+        # Route straight to the fallback model while the selected one is down
         service = create_llm_service(
             provider=provider,
             model=selected_model,
+            fallback_model=st.session_state.runtime_config.get(
+                "circuit_breaker", {}
+            ).get("fallback_model"),
         )
 
-        response = service.get_llm_response(
-            f"{sys_instr}\n\nSummarize the following text:\n{prompt}"
+        job_manager.submit(
+            session_id,
+            thread_id,
+            service.aget_llm_stream(
+                f"{st.session_state.page_1_sys_instr}\n\n"
+                f"Summarize the following text:\n{prompt}"
+            ),
         )
+        st.session_state.page_1_job_cursor = 0
 
         st.session_state.page_1_messages.append({"role": "user", "content": prompt})
-        st.session_state.page_1_messages.append(
-            {"role": "assistant", "content": response.content}
-        )
-
-        # Display results
-        logger.info("Successfully generated summary")
+        st.session_state.page_1_messages.append({"role": "assistant", "content": ""})
 
     except Exception as e:
         logger.error(f"Error during summarization: {str(e)}")
         st.error("An error occurred while generating the summary. Please try again.")
 
-# Display chat messages
-for msg in st.session_state.page_1_messages:
-    st.chat_message(msg["role"]).write(msg["content"])
+
+def live_exchange() -> None:
+    """Drain new chunks from the background job and display the exchange."""
+    profile_fragment("summarizer.live_exchange")
+    track_session()
+    job = job_manager.get(session_id, thread_id)
+    finished = job is not None and job.finished
+    if job is not None:
+        chunks = job.read(st.session_state.page_1_job_cursor)
+        st.session_state.page_1_job_cursor += len(chunks)
+        if chunks:
+            st.session_state.page_1_messages[-1]["content"] += "".join(
+                chunk.text for chunk in chunks
+            )
+
+    if finished and job.status != "done":
+        logger.error(f"Summarization job ended with status {job.status}")
+        st.session_state.page_1_job_failed = True
+        # Drop the incomplete exchange, as a failed summary is never recorded
+        del st.session_state.page_1_messages[-2:]
+    elif finished:
+        logger.info("Successfully generated summary")
+
+    # Display the exchange in progress (user text and streamed summary)
+    if job is not None and not finished:
+        for msg in st.session_state.page_1_messages[-2:]:
+            st.chat_message(msg["role"]).write(msg["content"])
+
+    if finished:
+        job_manager.release(job)
+        persist_session()
+        # Rerun the full script to stop polling
+        st.rerun()
+
+
+@st.fragment
+def chat_region() -> None:
+    """Handle text submission and display the chat history."""
+    profile_fragment("summarizer.chat_region")
+    track_session()
+    if prompt := st.chat_input("Enter text to summarize..."):
+        submit_summary(prompt)
+
+    # Report a background job that failed or was abandoned during a poll
+    if st.session_state.pop("page_1_job_failed", False):
+        st.error("An error occurred while generating the summary. Please try again.")
+
+    # Display the finished history; the exchange in progress is polled below
+    has_job = job_manager.get(session_id, thread_id) is not None
+    messages = st.session_state.page_1_messages
+    for msg in messages[:-2] if has_job else messages:
+        st.chat_message(msg["role"]).write(msg["content"])
+
+    # Poll only while a job is attached to this page
+    poll_interval = st.session_state.runtime_config["jobs"].get("poll_interval", 0.5)
+    st.fragment(live_exchange, run_every=poll_interval if has_job else None)()
+
+
+# ------------------------------------------------------------------------
+# Model Comparison Section
+# ------------------------------------------------------------------------
+# Every selected pair streams from its own background job on the shared
+# event loop, and each run is measured and recorded in the benchmark history.
+def compare_thread(label: str) -> str:
+    """Job thread of a compared provider/model pair."""
+    return f"compare:{label}"
+
+
+def submit_comparison(prompt: str) -> None:
+    """Submit one summarization job per selected provider/model pair."""
+    pairs = st.session_state.get("page_1_compare_pairs", [])
+    if not pairs:
+        st.warning("Select at least one model to compare.")
+        return
+
+    comparison = st.session_state.get("page_1_comparison")
+    if comparison and any(
+        job_manager.get(session_id, compare_thread(label)) is not None
+        for label in comparison["runs"]
+    ):
+        st.warning("Still running the previous comparison. Please wait.")
+        return
+
+    logger.info(f"Comparing {len(pairs)} models for summarization")
+    history = get_benchmark_history()
+    runs = {}
+    for label in pairs:
+        provider_key, model = label.split(" / ", 1)
+        provider = st.session_state.model_config[provider_key].get("model_provider")
+        metrics = RunMetrics(provider=provider, model=model, prompt_chars=len(prompt))
+        runs[label] = {"metrics": metrics, "text": "", "cursor": 0}
+        try:
+            service = create_llm_service(provider=provider, model=model)
+            job_manager.submit(
+                session_id,
+                compare_thread(label),
+                measure_stream(
+                    service.aget_llm_stream(
+                        f"{st.session_state.page_1_sys_instr}\n\n"
+                        f"Summarize the following text:\n{prompt}"
+                    ),
+                    metrics,
+                    history,
+                ),
+            )
+        except Exception as e:
+            logger.error(f"Error starting comparison for {label}: {str(e)}")
+            metrics.status = "failed"
+            metrics.error = str(e)
+            history.record(metrics)
+
+    st.session_state.page_1_comparison = {"prompt": prompt, "runs": runs}
+
+
+def format_metrics(metrics: RunMetrics) -> str:
+    """Format the measurements of a compared run as a caption."""
+    if metrics.status == "running":
+        if metrics.ttft is None:
+            return "⏳ Waiting for the first token..."
+        return f"⏳ Streaming · TTFT {metrics.ttft:.2f}s"
+    if metrics.status != "done":
+        return f"❌ {metrics.status.capitalize()}: {metrics.error or 'no response'}"
+
+    tokens_per_second = metrics.tokens_per_second
+    estimated = " (est.)" if metrics.estimated_tokens else ""
+    return (
+        f"TTFT {metrics.ttft or 0.0:.2f}s · total {metrics.latency:.2f}s · "
+        f"{tokens_per_second or 0.0:.1f} tok/s · "
+        f"{metrics.input_tokens} in / {metrics.output_tokens} out tokens{estimated}"
+    )
+
+
+def comparison_results() -> None:
+    """Drain the comparison jobs and display each output in its own column."""
+    profile_fragment("summarizer.comparison_results")
+    track_session()
+    comparison = st.session_state.get("page_1_comparison")
+    if not comparison:
+        return
+
+    st.chat_message("user").write(comparison["prompt"])
+    attached = False
+    running = False
+    labels = list(comparison["runs"])
+    for column, label in zip(st.columns(len(labels)), labels, strict=True):
+        run = comparison["runs"][label]
+        job = job_manager.get(session_id, compare_thread(label))
+        if job is not None:
+            attached = True
+            chunks = job.read(run["cursor"])
+            run["cursor"] += len(chunks)
+            run["text"] += "".join(chunk.text for chunk in chunks)
+            if job.finished:
+                job_manager.release(job)
+            else:
+                running = True
+
+        with column:
+            st.markdown(f"**{label}**")
+            st.caption(format_metrics(run["metrics"]))
+            st.write(run["text"])
+
+    if attached and not running:
+        # Rerun the full script to stop polling
+        st.rerun()
+
+
+@st.fragment
+def benchmark_history() -> None:
+    """Display the measurements recorded across all comparisons."""
+    profile_fragment("summarizer.benchmark_history")
+    with st.expander("📊 Benchmark history"):
+        summary = get_benchmark_history().summary()
+        if summary.empty:
+            st.caption("No comparisons recorded yet.")
+        else:
+            st.dataframe(summary, hide_index=True, width="stretch")
+
+        # Provider health, shared by every session of this process
+        circuits = get_circuit_breakers().metrics()
+        if circuits:
+            st.caption("Circuit breakers")
+            st.dataframe(circuits, hide_index=True, width="stretch")
+
+
+@st.fragment
+def compare_region() -> None:
+    """Handle text submission and display the polled comparison."""
+    profile_fragment("summarizer.compare_region")
+    track_session()
+    if prompt := st.chat_input("Enter text to summarize with every model..."):
+        submit_comparison(prompt)
+
+    # Poll only while comparison jobs are attached to this page
+    poll_interval = st.session_state.runtime_config["jobs"].get("poll_interval", 0.5)
+    comparison = st.session_state.get("page_1_comparison") or {"runs": {}}
+    has_job = any(
+        job_manager.get(session_id, compare_thread(label)) is not None
+        for label in comparison["runs"]
+    )
+    st.fragment(comparison_results, run_every=poll_interval if has_job else None)()
+
+
+if compare_mode:
+    compare_region()
+    benchmark_history()
+else:
+    chat_region()
 
 # ------------------------------------------------------------------------
 # Footer Section
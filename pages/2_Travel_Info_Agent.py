@@ -10,15 +10,21 @@ import streamlit as st
 
 from src.miscs.disclaimer import show_disclaimer_dialog
 from src.models.llm import create_llm_service
-from src.tools.web_search import web_search
+from src.models.semantic_cache import get_semantic_cache
+from src.tools.web_search import get_search_prefetcher, web_search
 from src.utils.environment import initialize_environment
+from src.utils.jobs import get_job_manager
 from src.utils.logger import setup_logger
+from src.utils.profiling import profile_fragment, profile_page
+from src.utils.session_state import persist_session, track_session
 
 # ------------------------------------------------------------------------
 # Initialization and Configuration
 # ------------------------------------------------------------------------
 # Initialize environment and logging
+profile_page("travel_info_agent")
 initialize_environment()
+track_session()
 logger = setup_logger("travel_info_agent")
 
 # Configure page
@@ -30,63 +36,147 @@ if "page_2_messages" not in st.session_state:
     st.session_state.page_2_messages = []
 
 # ------------------------------------------------------------------------
-# Model Selection Section
+# Model Selection and System Instructions Section
 # ------------------------------------------------------------------------
-# Initialize session state for provider selection
+# Settings live in their own fragment so changing them only reruns this
+# section; the chat fragment reads the current values from widget keys.
+# Initialize session state for provider and model selection
 if "previous_provider" not in st.session_state:
     st.session_state.previous_provider = None
 
-# Provider dropdown
-selected_provider = st.selectbox(
-    "Select Provider",
-    options=[key.upper() for key in st.session_state.model_config.keys()],
-    help="Choose the AI provider for text summarization",
-)
-
-# Log provider changes
-if selected_provider != st.session_state.previous_provider:
-    logger.info(f"Selected provider: {selected_provider}")
-    st.session_state.previous_provider = selected_provider
-
-# Initialize session state for model selection
 if "previous_model" not in st.session_state:
     st.session_state.previous_model = None
 
-# Model dropdown
-model_options = st.session_state.model_config[selected_provider].get("model", None)
-selected_model = st.selectbox(
-    "Select Model",
-    options=model_options,
-    help="Choose the specific model for summarization",
-)
 
-# Log model changes
-if selected_model != st.session_state.previous_model:
-    logger.info(f"Selected model: {selected_model}")
-    st.session_state.previous_model = selected_model
+@st.fragment
+def model_settings() -> None:
+    """Display the provider, model and system instruction inputs."""
+    profile_fragment("travel_info_agent.model_settings")
+    # Provider dropdown
+    selected_provider = st.selectbox(
+        "Select Provider",
+        options=[key.upper() for key in st.session_state.model_config.keys()],
+        help="Choose the AI provider for text summarization",
+        key="page_2_provider",
+    )
 
-# ------------------------------------------------------------------------
-# System Instructions Section
-# ------------------------------------------------------------------------
-sys_instr = st.text_area(
-    "System Instructions",
-    height=175,
-    value=st.session_state.instructions_config["travel_info_agent"].get(
-        "sys_prompt", ""
-    ),
-    help="Customize the instructions given to the AI model",
-)
+    # Log provider changes
+    if selected_provider != st.session_state.previous_provider:
+        logger.info(f"Selected provider: {selected_provider}")
+        st.session_state.previous_provider = selected_provider
+
+    # Model dropdown
+    model_options = st.session_state.model_config[selected_provider].get("model", None)
+    selected_model = st.selectbox(
+        "Select Model",
+        options=model_options,
+        help="Choose the specific model for summarization",
+        key="page_2_model",
+    )
+
+    # Log model changes
+    if selected_model != st.session_state.previous_model:
+        logger.info(f"Selected model: {selected_model}")
+        st.session_state.previous_model = selected_model
+
+    st.text_area(
+        "System Instructions",
+        height=175,
+        value=st.session_state.instructions_config["travel_info_agent"].get(
+            "sys_prompt", ""
+        ),
+        help="Customize the instructions given to the AI model",
+        key="page_2_sys_instr",
+    )
+
+
+model_settings()
 
 # ------------------------------------------------------------------------
 # Text Input and Summarization Section
 # ------------------------------------------------------------------------
+# Agent runs are submitted as background jobs keyed by session and thread so
+# they survive reruns and navigation. Submitting a prompt only reruns the chat
+# fragment, and a nested fragment polls the job while one is attached. The
+# finished history is drawn once by the chat fragment; polls only redraw the
+# exchange in progress, so their cost does not grow with the history.
+job_manager = get_job_manager()
+session_id = st.session_state.session_id
+
+# `thread_id` identifies the conversation within the session's own
+# checkpointer; it does not depend on the session ID, so that a session
+# resumed under a new ID keeps its agent memory.
+thread_id = "travel_info_agent"
 
-# Text input and processing
-if prompt := st.chat_input("Enter desired travel destination..."):
+if "page_2_job_cursor" not in st.session_state:
+    st.session_state.page_2_job_cursor = 0
+
+# Index of the first message of the exchange in progress
+if "page_2_live_start" not in st.session_state:
+    st.session_state.page_2_live_start = len(st.session_state.page_2_messages)
+
+# Cached exchanges not yet seen by the agent, replayed with the next prompt
+if "page_2_pending_context" not in st.session_state:
+    st.session_state.page_2_pending_context = []
+
+# Paraphrases of recent questions are answered from the semantic cache
+cache_config = st.session_state.runtime_config.get("semantic_cache", {})
+semantic_cache = get_semantic_cache() if cache_config.get("enabled", False) else None
+
+
+def append_agent_chunk(chunk: dict) -> None:
+    """Convert an agent stream chunk into chat history messages."""
+    for key, value in chunk.items():
+        logger.info(f"Agent Calls -> {chunk}")
+        if key == "model":
+            if isinstance(value["messages"][-1].content, list):
+                ai_response = value["messages"][-1].content[-1]["text"]
+            elif (value["messages"][-1].content == "") and (
+                value["messages"][-1].tool_calls
+            ):
+                tool_call = value["messages"][-1].tool_calls[-1]
+                ai_response = f"Tool[{tool_call['name'].upper()}] invoked with input: {tool_call['args']["query"]}"
+            else:
+                ai_response = value["messages"][-1].content
+
+            st.session_state.page_2_messages.append(
+                {"role": "assistant", "content": ai_response}
+            )
+        else:
+            st.session_state.page_2_messages.append({"role": "tools", "content": chunk})
+
+
+def submit_prompt(prompt: str) -> None:
+    """Submit a travel agent job for the current model settings."""
     logger.info("Received user input for travel information")
+    running_job = job_manager.get(session_id, thread_id)
+    if running_job is not None and not running_job.finished:
+        st.warning("Still answering your previous request. Please wait.")
+        return
+
+    # Follow-up answers depend on the conversation, so only the opening
+    # question is answered from and shared through the process-wide cache
+    opening = not st.session_state.page_2_messages
+    if (
+        semantic_cache is not None
+        and opening
+        and (hit := semantic_cache.lookup(prompt))
+    ):
+        answer = {"role": "assistant", "content": hit.answer}
+        st.session_state.page_2_messages.append({"role": "user", "content": prompt})
+        st.session_state.page_2_messages.append(
+            {**answer, "cached_similarity": hit.similarity}
+        )
+        st.session_state.page_2_pending_context.extend(
+            [{"role": "user", "content": prompt}, answer]
+        )
+        persist_session()
+        return
+
     try:
-        # Get provider configuration and run summarization
-        provider = st.session_state.model_config[selected_provider].get(
+        # Get provider configuration and run the agent in the background
+        selected_model = st.session_state.page_2_model
+        provider = st.session_state.model_config[st.session_state.page_2_provider].get(
             "model_provider", None
         )
         logger.debug(f"Using provider: {provider} with model: {selected_model}")
@@ -100,35 +190,27 @@ if prompt := st.chat_input("Enter desired travel destination..."):
             ),
         )
 
-        # `thread_id` is a unique identifier for a given conversation.
-        config = {"configurable": {"thread_id": st.session_state.session_id}}
+        config = {"configurable": {"thread_id": thread_id}}
 
+        st.session_state.page_2_live_start = len(st.session_state.page_2_messages)
         st.session_state.page_2_messages.append({"role": "user", "content": prompt})
 
-        for chunk in service.get_agent_stream(
-            messages=[{"role": "user", "content": f"{prompt}"}],
+        stream = service.aget_agent_stream(
+            messages=[
+                *st.session_state.page_2_pending_context,
+                {"role": "user", "content": f"{prompt}"},
+            ],
             config=config,
-        ):
-            for key, value in chunk.items():
-                logger.info(f"Agent Calls -> {chunk}")
-                if key == "model":
-                    if isinstance(value["messages"][-1].content, list):
-                        ai_response = value["messages"][-1].content[-1]["text"]
-                    elif (value["messages"][-1].content == "") and (
-                        value["messages"][-1].tool_calls
-                    ):
-                        tool_call = value["messages"][-1].tool_calls[-1]
-                        ai_response = f"Tool[{tool_call['name'].upper()}] invoked with input: {tool_call['args']["query"]}"
-                    else:
-                        ai_response = value["messages"][-1].content
-
-                    st.session_state.page_2_messages.append(
-                        {"role": "assistant", "content": ai_response}
-                    )
-                else:
-                    st.session_state.page_2_messages.append(
-                        {"role": "tools", "content": chunk}
-                    )
+        )
+        # Search for the prompt while the first model call is in flight
+        if st.session_state.runtime_config.get("web_search", {}).get("prefetch", False):
+            stream = get_search_prefetcher().wrap(prompt, stream)
+
+        job_manager.submit(session_id, thread_id, stream)
+        st.session_state.page_2_job_cursor = 0
+        st.session_state.page_2_pending_context = []
+        if opening:
+            st.session_state.page_2_cache_query = prompt
 
     except Exception as e:
         logger.error(f"Error during travel info agent: {str(e)}")
@@ -136,14 +218,112 @@ if prompt := st.chat_input("Enter desired travel destination..."):
             "An error occurred while generating the travel information. Please try again."
         )
 
-# Display chat messages
-for msg in st.session_state.page_2_messages:
+
+def render_message(msg: dict) -> None:
+    """Display a chat message or the expander of an agent step."""
     if msg["role"] == "tools":
         for key, value in msg["content"].items():
             with st.expander(f"🤖 **Agent Triggered**: {key}"):
-                st.write(f"💬 **Response**: {str(value)}")
+                messages = value.get("messages", []) if value else []
+                if not messages:
+                    st.write(f"💬 **Response**: {str(value)}")
+                for message in messages:
+                    st.write(f"💬 **Response**: {getattr(message, 'content', message)}")
+                    # Raw search payloads are kept out of the model context
+                    if getattr(message, "artifact", None):
+                        st.caption("Raw search results")
+                        st.json(message.artifact, expanded=False)
     else:
-        st.chat_message(msg["role"]).write(msg["content"])
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
+            if "cached_similarity" in msg:
+                st.caption(
+                    f"⚡ Served from cache (similarity {msg['cached_similarity']:.2f})"
+                )
+
+
+def live_exchange() -> None:
+    """Drain new events from the background job and display the exchange."""
+    profile_fragment("travel_info_agent.live_exchange")
+    track_session()
+    job = job_manager.get(session_id, thread_id)
+    finished = job is not None and job.finished
+    if job is not None:
+        events = job.read(st.session_state.page_2_job_cursor)
+        st.session_state.page_2_job_cursor += len(events)
+        for chunk in events:
+            append_agent_chunk(chunk)
+
+    # Display the exchange in progress
+    if job is not None and not finished:
+        live_start = st.session_state.page_2_live_start
+        for msg in st.session_state.page_2_messages[live_start:]:
+            render_message(msg)
+
+    if finished:
+        cache_query = st.session_state.pop("page_2_cache_query", None)
+        last_msg = st.session_state.page_2_messages[-1]
+        if job.status != "done":
+            logger.error(f"Travel info agent job ended with status {job.status}")
+            st.session_state.page_2_job_failed = True
+        elif (
+            semantic_cache is not None
+            and cache_query
+            and last_msg["role"] == "assistant"
+        ):
+            semantic_cache.store(cache_query, last_msg["content"])
+        job_manager.release(job)
+        persist_session()
+        # Rerun the full script to stop polling
+        st.rerun()
+    elif job is not None:
+        st.caption("⏳ Working on it...")
+
+
+@st.fragment
+def chat_region() -> None:
+    """Handle prompt submission and display the chat history."""
+    profile_fragment("travel_info_agent.chat_region")
+    track_session()
+    if prompt := st.chat_input("Enter desired travel destination..."):
+        submit_prompt(prompt)
+
+    # Report a background job that failed or was abandoned during a poll
+    if st.session_state.pop("page_2_job_failed", False):
+        st.error(
+            "An error occurred while generating the travel information. Please try again."
+        )
+
+    # Display the finished history; the exchange in progress is polled below
+    has_job = job_manager.get(session_id, thread_id) is not None
+    messages = st.session_state.page_2_messages
+    for msg in messages[: st.session_state.page_2_live_start] if has_job else messages:
+        render_message(msg)
+
+    # Poll only while a job is attached to this conversation
+    poll_interval = st.session_state.runtime_config["jobs"].get("poll_interval", 0.5)
+    st.fragment(live_exchange, run_every=poll_interval if has_job else None)()
+
+
+chat_region()
+
+
+@st.fragment
+def semantic_cache_stats() -> None:
+    """Display semantic cache metrics, sampled hits and invalidation."""
+    profile_fragment("travel_info_agent.semantic_cache_stats")
+    with st.expander("⚡ Semantic cache"):
+        st.json(semantic_cache.metrics())
+        st.caption("Sampled hits for false-hit review")
+        st.dataframe(semantic_cache.sampled_hits(), width="stretch")
+        destination = st.text_input("Destination to invalidate", key="cache_dest")
+        if st.button("Invalidate", key="cache_invalidate_btn") and destination:
+            removed = semantic_cache.invalidate(destination)
+            st.success(f"Removed {removed} cached answers for {destination}")
+
+
+if semantic_cache is not None:
+    semantic_cache_stats()
 
 
 # ------------------------------------------------------------------------
@@ -3,20 +3,28 @@ This Page uses auto executed code blocks from agents to build a customized tool
 The tools generated are static utilities that don't require external APIs or ML models.
 """
 
-import re
+import time
 from datetime import datetime
+from typing import AsyncIterator
 
 import streamlit as st
 
 from src.models.llm import create_llm_service
+from src.tools import data_helpers  # noqa: F401 - exposed to generated code
 from src.utils.environment import initialize_environment
+from src.utils.jobs import Job, get_job_manager
 from src.utils.logger import setup_logger
+from src.utils.profiling import profile_fragment, profile_page
+from src.utils.session_state import persist_session, track_session
+from src.utils.stream_parser import TagStreamParser
 
 # ------------------------------------------------------------------------
 # Initialization and Configuration
 # ------------------------------------------------------------------------
 # Initialize environment and logging
+profile_page("customized_tools")
 initialize_environment()
+track_session()
 logger = setup_logger("customized_tools")
 
 # Configure page
@@ -24,6 +32,10 @@ st.set_page_config(page_title="Customized Tools")
 st.title("Customized Tools")
 
 
+# Job thread of the tool generation within the session
+JOB_THREAD = "customized_tools"
+
+
 # ------------------------------------------------------------------------
 # Helper Functions
 # ------------------------------------------------------------------------
@@ -41,65 +53,109 @@ def save_code_blocks(code_blocks: list[str], timestamp: str) -> None:
         logger.error(f"Error saving code blocks: {e}")
 
 
-def generate_and_execute_tools(user_requirements: str) -> None:
-    """Generate and execute customized tools based on user requirements."""
+def execute_code_block(index: int, code: str) -> None:
+    """Display and execute a generated code block."""
+    st.markdown(f"#### 🔧 Generated Tool Code Block {index}")
+    try:
+        exec(code, globals())
+        logger.debug(f"Successfully executed code block {index}")
+    except Exception as e:
+        st.error(f"Error executing code block {index}: {str(e)}")
+        logger.error(f"Error executing code block {index}: {e}")
+
+
+@st.fragment
+def render_code_block(index: int, code: str) -> None:
+    """Execute a generated code block as an independently rerunning fragment."""
+    profile_fragment("customized_tools.render_code_block")
+    execute_code_block(index, code)
+
+
+async def stream_code_blocks(stream: AsyncIterator, timestamp: str) -> AsyncIterator:
+    """Yield each code block of a streamed response as soon as it is closed."""
+    started = time.perf_counter()
+    parser = TagStreamParser("execute_python")
+    count = 0
+    async for chunk in stream:
+        for code in parser.feed(chunk.text):
+            count += 1
+            logger.info(
+                f"[{timestamp}] Received code block {count} "
+                f"after {time.perf_counter() - started:.1f}s"
+            )
+            yield code
+
+
+def generate_tools(user_requirements: str) -> None:
+    """Start generating customized tools based on user requirements."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    with st.spinner("🔄 Generating your customized tools... Please wait..."):
-        # Log user requirements
-        try:
-            with open("logs/user_requirements.log", "a") as f:
-                f.write(f"[{timestamp}] User Requirements:\n{user_requirements}\n\n")
-            logger.info(f"Logged user requirements at {timestamp}")
-        except Exception as e:
-            logger.error(f"Error logging user requirements: {e}")
-
-        sys_instr = st.session_state.instructions_config["customized_tools"].get(
-            "sys_prompt", ""
-        )
+    # Log user requirements
+    try:
+        with open("logs/user_requirements.log", "a") as f:
+            f.write(f"[{timestamp}] User Requirements:\n{user_requirements}\n\n")
+        logger.info(f"Logged user requirements at {timestamp}")
+    except Exception as e:
+        logger.error(f"Error logging user requirements: {e}")
+
+    sys_instr = st.session_state.instructions_config["customized_tools"].get(
+        "sys_prompt", ""
+    )
+
+    # Generate tool using LLM
+    llm_service = create_llm_service(
+        model="claude-sonnet-4-5-20250929",
+        provider="anthropic",
+    )
+
+    # Generate in a background job, so that using a tool that is already
+    # rendered cannot interrupt the generation of the remaining ones
+    stream = llm_service.aget_llm_stream(
+        f"{sys_instr}\n\n User Requirements:\n{user_requirements}"
+    )
+    job_manager.submit(session_id, JOB_THREAD, stream_code_blocks(stream, timestamp))
+    st.session_state.code_blocks = []
+    st.session_state.timestamp = timestamp
 
-        # Generate tool using LLM
-        llm_service = create_llm_service(
-            model="claude-sonnet-4-5-20250929",
-            provider="anthropic",
-        )
 
-        response = llm_service.get_llm_response(
-            f"{sys_instr}\n\n User Requirements:\n{user_requirements}"
-        )
+def receive_code_blocks(job: Job) -> None:
+    """
+    Execute code blocks as the generation job produces them.
 
-        # Extract code blocks
-        response_content = (
-            str(response.content) if hasattr(response, "content") else str(response)
-        )
-        code_blocks = re.findall(
-            r"<execute_python>(.*?)</execute_python>", response_content, re.DOTALL
-        )
+    Each block is stored in session state as soon as it arrives and rendered
+    in its own fragment, so it executes once and stays on the page.
 
-        # Store code blocks in session state to persist across refreshes
-        st.session_state.code_blocks = code_blocks
-        st.session_state.timestamp = timestamp
-
-        # Execute each code block
-        for i, code in enumerate(code_blocks, 1):
-            st.markdown(f"#### 🔧 Generated Tool Code Block {i}")
-            try:
-                exec(code, globals())
-                logger.info(f"[{timestamp}] Successfully executed code block {i}")
-            except Exception as e:
-                st.error(f"Error executing code block {i}: {str(e)}")
-                logger.error(f"[{timestamp}] Error executing code block {i}: {e}")
-
-        if not code_blocks:
-            st.error(
-                "No valid tools were generated. Please try rephrasing your requirements."
-            )
-            logger.warning(f"[{timestamp}] No valid code blocks generated")
-            return
+    Args:
+        job (Job): Running or finished generation job
+    """
+    timestamp = st.session_state.timestamp
+    poll_interval = st.session_state.runtime_config["jobs"].get("poll_interval", 0.5)
+
+    with st.spinner("🔄 Generating your customized tools... Please wait..."):
+        while True:
+            finished = job.finished
+            for code in job.read(len(st.session_state.code_blocks)):
+                st.session_state.code_blocks.append(code)
+                persist_session()
+                render_code_block(len(st.session_state.code_blocks), code)
+            if finished:
+                break
+            time.sleep(poll_interval)
+
+    job_manager.release(job)
+    code_blocks = st.session_state.code_blocks
+    if job.status != "done":
+        logger.error(f"[{timestamp}] Tool generation ended with status {job.status}")
+    if not code_blocks:
+        st.error(
+            "No valid tools were generated. Please try rephrasing your requirements."
+        )
+        logger.warning(f"[{timestamp}] No valid code blocks generated")
+        return
 
-        # Save generated code blocks
-        save_code_blocks(code_blocks, timestamp)
-        logger.info(f"[{timestamp}] Generated {len(code_blocks)} code blocks")
+    # Save generated code blocks
+    save_code_blocks(code_blocks, timestamp)
+    logger.info(f"[{timestamp}] Generated {len(code_blocks)} code blocks")
 
 
 # ------------------------------------------------------------------------
@@ -110,26 +166,42 @@ if "code_blocks" not in st.session_state:
     st.session_state.code_blocks = []
     st.session_state.timestamp = None
 
-st.markdown("### ✍️ Tool Requirements")
-user_requirements = st.text_area(
-    "Enter your requirements for customized tools:", height=150
-)
-
-if st.button("Generate Tools", key="generate_tools_btn"):
-    if not user_requirements.strip():
-        st.error("Please enter your tool requirements before generating.")
-    else:
-        generate_and_execute_tools(user_requirements)
-
-# Re-execute stored code blocks on page refresh
-if st.session_state.code_blocks:
-    for i, code in enumerate(st.session_state.code_blocks, 1):
-        st.markdown(f"#### 🔧 Generated Tool Code Block {i}")
-        try:
-            exec(code, globals())
-        except Exception as e:
-            st.error(f"Error executing code block {i}: {str(e)}")
-            logger.error(f"Error re-executing code block {i}: {e}")
+job_manager = get_job_manager()
+session_id = st.session_state.session_id
+
+
+@st.fragment
+def tool_requirements() -> None:
+    """Collect tool requirements without re-executing the generated tools."""
+    profile_fragment("customized_tools.tool_requirements")
+    st.markdown("### ✍️ Tool Requirements")
+    user_requirements = st.text_area(
+        "Enter your requirements for customized tools:", height=150
+    )
+
+    if st.button("Generate Tools", key="generate_tools_btn"):
+        running_job = job_manager.get(session_id, JOB_THREAD)
+        if not user_requirements.strip():
+            st.error("Please enter your tool requirements before generating.")
+        elif running_job is not None and not running_job.finished:
+            st.warning("Still generating your previous tools. Please wait.")
+        else:
+            generate_tools(user_requirements)
+            # Rerun the full script to clear the previous tools
+            st.rerun()
+
+
+tool_requirements()
+
+# Execute stored code blocks, each in its own fragment so that interacting
+# with one generated tool only re-executes that block
+for i, code in enumerate(st.session_state.code_blocks, 1):
+    render_code_block(i, code)
+
+# Blocks still being generated are executed once as they arrive, including
+# after a rerun or navigation while the generation job kept running
+if (job := job_manager.get(session_id, JOB_THREAD)) is not None:
+    receive_code_blocks(job)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,162 @@
+"""
+Model benchmarking utilities.
+
+This module measures streamed model responses (time to first token, total
+latency, token counts and throughput) and keeps a local history of the runs,
+so that default and fallback models can be chosen from measured data.
+"""
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import pandas as pd
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("benchmark")
+
+
+@dataclass
+class RunMetrics:
+    """Measurements of a single streamed model response."""
+
+    provider: str
+    model: str
+    status: str = "running"
+    error: Optional[str] = None
+    ttft: Optional[float] = None
+    latency: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    estimated_tokens: bool = False
+    prompt_chars: int = 0
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Output tokens per second of generation after the first token."""
+        if not self.latency or not self.output_tokens:
+            return None
+        generation = self.latency - (self.ttft or 0.0)
+        return self.output_tokens / (generation if generation > 0.05 else self.latency)
+
+
+class BenchmarkHistory:
+    """Append-only JSON lines history of benchmark runs."""
+
+    def __init__(self, path: str = "logs/model_benchmarks.jsonl"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: RunMetrics) -> None:
+        """
+        Append a finished run to the history.
+
+        Args:
+            metrics (RunMetrics): Measurements of the run
+        """
+        entry = {**asdict(metrics), "tokens_per_second": metrics.tokens_per_second}
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except Exception as e:
+            logger.error(f"Error recording benchmark: {e}")
+
+    def load(self) -> List[Dict]:
+        """Load every recorded run."""
+        if not self.path.exists():
+            return []
+        with self._lock, open(self.path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Aggregate the history per provider/model pair.
+
+        Returns:
+            pd.DataFrame: Run counts, success rate and median measurements,
+                fastest pairs first
+        """
+        runs = pd.DataFrame(self.load())
+        if runs.empty:
+            return runs
+
+        runs["success"] = runs["status"] == "done"
+        done = runs[runs["success"]]
+        summary = runs.groupby(["provider", "model"]).agg(
+            runs=("status", "size"), success_rate=("success", "mean")
+        )
+        medians = done.groupby(["provider", "model"])[
+            ["ttft", "latency", "tokens_per_second", "output_tokens"]
+        ].median()
+        summary = summary.join(medians.add_prefix("median_"))
+        return summary.sort_values("median_latency").reset_index()
+
+
+async def measure_stream(
+    stream: AsyncIterator,
+    metrics: RunMetrics,
+    history: Optional[BenchmarkHistory] = None,
+) -> AsyncIterator:
+    """
+    Pass a model stream through while measuring it.
+
+    Provider-reported usage is used for token counts when present; otherwise
+    input and output tokens are estimated at four characters per token of the
+    prompt and the response.
+
+    Args:
+        stream (AsyncIterator): Streamed model response chunks
+        metrics (RunMetrics): Measurements to fill in as chunks arrive
+        history (BenchmarkHistory, optional): History to record the run in
+
+    Yields:
+        The chunks of the stream, unchanged
+    """
+    started = time.perf_counter()
+    characters = 0
+    try:
+        async for chunk in stream:
+            text = chunk.text
+            if metrics.ttft is None and text:
+                metrics.ttft = time.perf_counter() - started
+            characters += len(text)
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                metrics.input_tokens += usage.get("input_tokens", 0)
+                metrics.output_tokens += usage.get("output_tokens", 0)
+            yield chunk
+        metrics.status = "done"
+    except Exception as e:
+        metrics.status = "failed"
+        metrics.error = str(e)
+        raise
+    finally:
+        metrics.latency = time.perf_counter() - started
+        if metrics.status == "running":
+            metrics.status = "cancelled"
+        if not metrics.output_tokens and characters:
+            metrics.output_tokens = max(1, characters // 4)
+            metrics.estimated_tokens = True
+        if not metrics.input_tokens and metrics.prompt_chars:
+            metrics.input_tokens = max(1, metrics.prompt_chars // 4)
+            metrics.estimated_tokens = True
+        if history is not None:
+            history.record(metrics)
+
+
+@lru_cache(maxsize=1)
+def get_benchmark_history() -> BenchmarkHistory:
+    """Get the process-wide benchmark history configured from runtime.toml."""
+    config = get_shared_config("runtime.toml").get("benchmark", {})
+    return BenchmarkHistory(
+        path=config.get("history_path", "logs/model_benchmarks.jsonl")
+    )
@@ -0,0 +1,326 @@
+"""
+Per-provider circuit breakers.
+
+This module tracks the health of every provider/model pair across the process.
+Consecutive provider failures (timeouts, connection errors, 5xx and 429
+responses) and latency outliers open a pair's circuit, after which
+calls are rejected in milliseconds (or routed to a fallback model) instead of
+waiting for the client timeout. After a cool-down a few probe calls are let
+through and the circuit closes again once one of them succeeds.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Provider SDK and HTTP client errors meaning the provider did not answer.
+# Matched by class name, so that no provider SDK has to be installed.
+UNAVAILABLE_ERRORS = frozenset(
+    {
+        "APIConnectionError",
+        "APITimeoutError",
+        "TransportError",
+        "TimeoutException",
+        "Timeout",
+        "ConnectionError",
+        "DeadlineExceeded",
+        "ServiceUnavailable",
+    }
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider/model whose circuit is open."""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status code of a provider error, if it carries one."""
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if isinstance(status, int) and not isinstance(status, bool):
+            return status
+    return None
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error means the provider is unavailable.
+
+    Timeouts, connection errors, 5xx and 429 responses are provider failures;
+    other errors, such as a 400 for an invalid request or a prompt exceeding
+    the context length, come from a provider that is answering.
+
+    Args:
+        error (BaseException): Error raised by a model call
+
+    Returns:
+        bool: True if the error counts toward opening the circuit
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in UNAVAILABLE_ERRORS for cls in type(error).__mro__):
+        return True
+    status = status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """Circuit breaker of a single provider/model pair."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        slow_call_threshold: float = 30.0,
+        outlier_factor: float = 4.0,
+        min_samples: int = 5,
+        window: int = 50,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.slow_call_threshold = slow_call_threshold
+        self.outlier_factor = outlier_factor
+        self.min_samples = min_samples
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.client_errors = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Admit a call, moving an open circuit to half-open after the cool-down.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or all probes are taken
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        f"{self.name} is unavailable, retrying in "
+                        f"{self.retry_in():.0f}s"
+                    )
+                self.state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit of {self.name} half-open, probing")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} is being probed")
+                self._probes += 1
+            self.calls += 1
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """
+        Record a completed call; latency outliers count as failures.
+
+        Args:
+            latency (Optional[float]): Seconds until the first chunk of a
+                stream, or None for calls timed over the whole completion,
+                whose duration depends on the answer length and is not
+                checked for outliers
+        """
+        with self._lock:
+            if latency is not None:
+                if self._is_outlier(latency):
+                    self.slow_calls += 1
+                    self._fail(f"slow call of {latency:.1f}s")
+                    return
+                self._latencies.append(latency)
+            self._close()
+
+    def record_failure(self, error: BaseException) -> None:
+        """
+        Record a failed call; only provider failures count toward opening.
+
+        Args:
+            error (BaseException): Error raised by the call
+        """
+        with self._lock:
+            if is_provider_failure(error):
+                self._fail(str(error) or type(error).__name__)
+                return
+            # The provider answered, it just rejected this request
+            self.client_errors += 1
+            self._close()
+
+    def release(self) -> None:
+        """Release an admitted call that was cancelled before an outcome."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _is_outlier(self, latency: float) -> bool:
+        if latency > self.slow_call_threshold:
+            return True
+        if len(self._latencies) < self.min_samples:
+            return False
+        return latency > self.outlier_factor * statistics.median(self._latencies)
+
+    def _close(self) -> None:
+        self.consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            logger.info(f"Circuit of {self.name} closed")
+
+    def _fail(self, reason: str) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = OPEN
+            self.opened += 1
+            self._opened_at = time.monotonic()
+            logger.warning(f"Circuit of {self.name} opened: {reason}")
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit admits a probe."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current state and counters of the circuit."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "client_errors": self.client_errors,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "median_latency": (
+                    statistics.median(self._latencies) if self._latencies else None
+                ),
+                "retry_in": self.retry_in(),
+            }
+
+
+class CircuitBreakerRegistry:
+    """Process-wide circuit breakers, one per provider/model pair."""
+
+    def __init__(self, **settings: Any):
+        self.settings = settings
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of a provider/model pair.
+
+        Args:
+            provider (str): Provider name, e.g. "groq"
+            model (str): Model name
+
+        Returns:
+            CircuitBreaker: The shared breaker of the pair
+        """
+        with self._lock:
+            key = (provider, model)
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(
+                    f"{provider}:{model}", **self.settings
+                )
+            return self._breakers[key]
+
+    def for_model(self, model: Any) -> CircuitBreaker:
+        """Get the circuit breaker of a chat model instance."""
+        try:
+            params = model._get_ls_params()
+            return self.get(params["ls_provider"], params["ls_model_name"])
+        except Exception:
+            return self.get(type(model).__name__, "default")
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """Metrics of every known circuit."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.metrics() for breaker in breakers]
+
+
+class CircuitBreakerMiddleware(AgentMiddleware):
+    """
+    Agent middleware guarding every model call with its circuit breaker.
+
+    Place it after ModelFallbackMiddleware, so that a call rejected by an open
+    circuit goes straight to the next fallback model. Agent model calls are not
+    streamed to the middleware, so their duration spans the whole completion
+    and only their failures are recorded, not their latency.
+    """
+
+    def __init__(self, registry: CircuitBreakerRegistry):
+        super().__init__()
+        self.registry = registry
+
+    def wrap_model_call(self, request: Any, handler: Callable[[Any], Any]) -> Any:
+        breaker = self.registry.for_model(request.model)
+        breaker.acquire()
+        try:
+            response = handler(request)
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return response
+
+    async def awrap_model_call(
+        self, request: Any, handler: Callable[[Any], Awaitable[Any]]
+    ) -> Any:
+        breaker = self.registry.for_model(request.model)
+        breaker.acquire()
+        try:
+            response = await handler(request)
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return response
+
+
+@lru_cache(maxsize=1)
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """Get the process-wide circuit breakers configured from runtime.toml."""
+    config = get_shared_config("runtime.toml").get("circuit_breaker", {})
+    return CircuitBreakerRegistry(
+        **{key: value for key, value in config.items() if key != "fallback_model"}
+    )
@@ -0,0 +1,322 @@
+"""
+Background conversation summarization.
+
+This module keeps a running summary of each agent conversation. After a turn
+completes, messages that fall out of the kept window are folded into the
+summary on the shared event loop, using only the messages not summarized
+yet. The next turn then sends the precomputed summary plus the recent
+messages to the model, so no turn waits for a summarization call. Summaries
+are also written to the shared state backend, when one is configured, so
+that they survive restarts and are shared by replicas.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Union
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.chat_models import BaseChatModel, init_chat_model
+from langchain_core.messages import (
+    AnyMessage,
+    HumanMessage,
+    ToolMessage,
+    get_buffer_string,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+
+from src.utils.event_loop import submit
+from src.utils.logger import setup_logger
+from src.utils.state_backend import StateBackend, get_state_backend
+
+logger = setup_logger("conversation_summary")
+
+SUMMARY_PREFIX = "Here is a summary of the conversation to date:\n\n"
+
+
+class TokenCounter:
+    """Approximate token counts cached per message ID."""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._counts: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, messages: Sequence[AnyMessage]) -> int:
+        """
+        Count the tokens of messages, only counting each message once.
+
+        Args:
+            messages (Sequence[AnyMessage]): Messages to count
+
+        Returns:
+            int: Approximate number of tokens
+        """
+        total = 0
+        for message in messages:
+            if message.id is None:
+                total += count_tokens_approximately([message])
+                continue
+            with self._lock:
+                tokens = self._counts.get(message.id)
+            if tokens is None:
+                tokens = count_tokens_approximately([message])
+                with self._lock:
+                    self._counts[message.id] = tokens
+                    if len(self._counts) > self.max_entries:
+                        self._counts.popitem(last=False)
+            total += tokens
+        return total
+
+
+@dataclass
+class Summary:
+    """Running summary of the oldest messages of a conversation."""
+
+    text: str = ""
+    covered: List[str] = field(default_factory=list)
+    tokens: int = 0
+
+
+class SummaryStore:
+    """
+    Running summaries keyed by session and thread.
+
+    Summaries are cached in the process and written through to the state
+    backend, if any, under the session's namespace.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        backend: Optional[StateBackend] = None,
+        retries: int = 5,
+    ):
+        self.max_entries = max_entries
+        self.backend = backend
+        self.retries = retries
+        self.tokens = TokenCounter()
+        self._summaries: OrderedDict = OrderedDict()
+        self._updating: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _location(key: str) -> Tuple[str, str]:
+        """Backend namespace and key of a "session:thread" conversation key."""
+        session_id, _, thread_id = key.partition(":")
+        return session_id, f"summary:{thread_id}"
+
+    def get(self, key: str, refresh: bool = False) -> Summary:
+        """
+        Get the summary of a conversation (empty if none yet).
+
+        The backend is only read for conversations not cached yet, including
+        ones without a summary, so model calls do not wait on it again.
+
+        Args:
+            key (str): Session and thread of the conversation
+            refresh (bool): Read the backend even if the summary is cached,
+                to pick up summaries written by other replicas
+
+        Returns:
+            Summary: The latest known summary
+        """
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is not None:
+                self._summaries.move_to_end(key)
+        if self.backend is not None and (entry is None or refresh):
+            value, version = None, 0
+            try:
+                value, version = self.backend.get(*self._location(key))
+            except Exception as e:
+                logger.error(f"Failed to read the summary of {key}: {e}")
+            if entry is None or version > entry[1]:
+                entry = (Summary(**value) if value else Summary(), version)
+                self._cache(key, entry)
+        return entry[0] if entry is not None else Summary()
+
+    def put(self, key: str, summary: Summary) -> None:
+        """
+        Store the summary of a conversation.
+
+        On a conflict with another replica, the summary covering more
+        messages wins.
+
+        Args:
+            key (str): Session and thread of the conversation
+            summary (Summary): Updated summary
+        """
+        with self._lock:
+            entry = self._summaries.get(key)
+        version = entry[1] if entry is not None else 0
+        if self.backend is not None:
+            local = asdict(summary)
+            try:
+                value, version = self.backend.update(
+                    *self._location(key),
+                    lambda remote: (
+                        remote
+                        if remote and len(remote["covered"]) > len(local["covered"])
+                        else local
+                    ),
+                    expected_version=version,
+                    value=local,
+                    retries=self.retries,
+                )
+                summary = Summary(**value)
+            except Exception as e:
+                logger.error(f"Failed to persist the summary of {key}: {e}")
+        self._cache(key, (summary, version))
+
+    def _cache(self, key: str, entry: Tuple[Summary, int]) -> None:
+        with self._lock:
+            self._summaries[key] = entry
+            self._summaries.move_to_end(key)
+            if len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+    def begin(self, key: str) -> bool:
+        """Claim a conversation for an update; False if one is in flight."""
+        with self._lock:
+            if key in self._updating:
+                return False
+            self._updating.add(key)
+            return True
+
+    def end(self, key: str) -> None:
+        """Release a conversation claimed with begin."""
+        with self._lock:
+            self._updating.discard(key)
+
+
+def covered_prefix(messages: Sequence[AnyMessage], summary: Summary) -> int:
+    """Number of leading messages the summary covers, or 0 if it is stale."""
+    count = len(summary.covered)
+    if count == 0 or len(messages) < count:
+        return 0
+    if [message.id for message in messages[:count]] != summary.covered:
+        return 0
+    return count
+
+
+class BackgroundSummarizationMiddleware(AgentMiddleware):
+    """
+    Agent middleware replacing old messages with a precomputed summary.
+
+    Model calls receive the stored summary and the messages after it. After
+    each turn, an update folding newly old messages into the summary is
+    scheduled on the shared event loop and never awaited by the turn.
+    """
+
+    def __init__(
+        self,
+        model: Union[str, BaseChatModel],
+        max_tokens_before_summary: int = 4000,
+        messages_to_keep: int = 20,
+        summary_prompt: str = "",
+        session_id: str = "",
+        store: Optional[SummaryStore] = None,
+    ):
+        super().__init__()
+        self.model = init_chat_model(model) if isinstance(model, str) else model
+        self.max_tokens_before_summary = max_tokens_before_summary
+        self.messages_to_keep = messages_to_keep
+        self.summary_prompt = summary_prompt
+        self.session_id = session_id
+        self.store = store or get_summary_store()
+
+    def _key(self) -> str:
+        try:
+            thread_id = get_config()["configurable"].get("thread_id", "")
+        except Exception:
+            thread_id = ""
+        return f"{self.session_id}:{thread_id}"
+
+    def _compact(self, messages: List[AnyMessage]) -> List[AnyMessage]:
+        """Messages for the model, with the covered prefix summarized."""
+        summary = self.store.get(self._key())
+        covered = covered_prefix(messages, summary)
+        if not covered:
+            return messages
+        return [
+            HumanMessage(content=SUMMARY_PREFIX + summary.text),
+            *messages[covered:],
+        ]
+
+    def wrap_model_call(self, request: Any, handler: Callable[[Any], Any]) -> Any:
+        request.messages = self._compact(request.messages)
+        return handler(request)
+
+    async def awrap_model_call(
+        self, request: Any, handler: Callable[[Any], Awaitable[Any]]
+    ) -> Any:
+        # The first call of a conversation may read the backend
+        request.messages = await asyncio.to_thread(self._compact, request.messages)
+        return await handler(request)
+
+    def after_agent(self, state: Any, runtime: Any) -> None:
+        key = self._key()
+        if self.store.begin(key):
+            submit(self.update(key, list(state["messages"])))
+
+    def cutoff(self, messages: Sequence[AnyMessage]) -> int:
+        """Index up to which messages may be summarized without splitting tool calls."""
+        cutoff = len(messages) - self.messages_to_keep
+        while 0 < cutoff < len(messages) and isinstance(messages[cutoff], ToolMessage):
+            cutoff -= 1
+        return max(cutoff, 0)
+
+    async def update(self, key: str, messages: List[AnyMessage]) -> None:
+        """
+        Fold messages that left the kept window into the running summary.
+
+        Args:
+            key (str): Session and thread of the conversation
+            messages (List[AnyMessage]): Full conversation after the turn
+        """
+        try:
+            # Backend round trips run off the shared event loop
+            summary = await asyncio.to_thread(self.store.get, key, True)
+            covered = covered_prefix(messages, summary)
+            if not covered:
+                summary = Summary()
+            context = summary.tokens + self.store.tokens.count(messages[covered:])
+            cutoff = self.cutoff(messages)
+            if context < self.max_tokens_before_summary or cutoff <= covered:
+                return
+            if any(message.id is None for message in messages[:cutoff]):
+                return
+
+            new = messages[covered:cutoff]
+            prompt = (
+                f"{self.summary_prompt.strip()}\n\n"
+                f"Summary so far:\n{summary.text or 'None'}\n\n"
+                f"New messages:\n{get_buffer_string(new)}\n\n"
+                "Return the updated summary."
+            )
+            response = await self.model.ainvoke(prompt)
+            text = str(response.content).strip()
+            await asyncio.to_thread(
+                self.store.put,
+                key,
+                Summary(
+                    text=text,
+                    covered=[message.id for message in messages[:cutoff]],
+                    tokens=self.store.tokens.count([HumanMessage(content=text)]),
+                ),
+            )
+            logger.info(f"Folded {len(new)} messages into the summary of {key}")
+        except Exception as e:
+            logger.error(f"Error summarizing conversation {key}: {e}")
+        finally:
+            self.store.end(key)
+
+
+@lru_cache(maxsize=1)
+def get_summary_store() -> SummaryStore:
+    """Get the process-wide store of conversation summaries."""
+    return SummaryStore(backend=get_state_backend())
@@ -2,8 +2,9 @@
 LLM module providing factory patterns for creating and running language models and agents.
 """
 
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple
 
 import streamlit as st
 from langchain.agents import create_agent
@@ -15,6 +16,19 @@ from langchain.agents.middleware import (
 from langchain.chat_models import BaseChatModel, init_chat_model
 from langgraph.checkpoint.memory import InMemorySaver
 
+from src.models.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerMiddleware,
+    CircuitOpenError,
+    get_circuit_breakers,
+)
+from src.models.conversation_summary import BackgroundSummarizationMiddleware
+from src.utils.logger import setup_logger
+
+logger = setup_logger("llm")
+
+Candidates = List[Tuple[BaseChatModel, CircuitBreaker]]
+
 
 @dataclass
 class LLMConfig:
@@ -24,6 +38,8 @@ class LLMConfig:
     model: str
     system_prompt: Optional[str] = None
     tools: Optional[List] = None
+    model_kwargs: Optional[Dict] = None
+    fallback_model: Optional[str] = None
 
 
 @dataclass
@@ -52,19 +68,32 @@ class LLMFactory:
                 )
             )
 
-        # Summarization Middleware
+        # Summarization Middleware, folding old messages into a running
+        # summary after each turn ("background") or within the turn ("inline")
         if config.get("summarization", {}).get("enabled", False):
             sum_config = config["summarization"]
-            middleware.append(
-                SummarizationMiddleware(
-                    model=sum_config.get("model"),
-                    max_tokens_before_summary=sum_config.get("max_tokens", 4000),
-                    messages_to_keep=sum_config.get("messages_to_keep", 20),
-                    summary_prompt=st.session_state.instructions_config[
-                        "travel_info_agent"
-                    ].get("summarizer_prompt", ""),
+            summary_prompt = st.session_state.instructions_config[
+                "travel_info_agent"
+            ].get("summarizer_prompt", "")
+            if sum_config.get("mode", "background") == "background":
+                middleware.append(
+                    BackgroundSummarizationMiddleware(
+                        model=sum_config.get("model"),
+                        max_tokens_before_summary=sum_config.get("max_tokens", 4000),
+                        messages_to_keep=sum_config.get("messages_to_keep", 20),
+                        summary_prompt=summary_prompt,
+                        session_id=st.session_state.session_id,
+                    )
+                )
+            else:
+                middleware.append(
+                    SummarizationMiddleware(
+                        model=sum_config.get("model"),
+                        max_tokens_before_summary=sum_config.get("max_tokens", 4000),
+                        messages_to_keep=sum_config.get("messages_to_keep", 20),
+                        summary_prompt=summary_prompt,
+                    )
                 )
-            )
 
         # Model Fallback Middleware
         if config.get("model_fallback", {}).get("enabled", False):
@@ -76,6 +105,11 @@ class LLMFactory:
                 )
             )
 
+        # Circuit Breaker Middleware, inside the fallback so that calls to a
+        # model with an open circuit go straight to the next fallback model
+        if config.get("circuit_breaker", {}).get("enabled", False):
+            middleware.append(CircuitBreakerMiddleware(get_circuit_breakers()))
+
         return middleware
 
     @staticmethod
@@ -84,6 +118,7 @@ class LLMFactory:
         return init_chat_model(
             model=config.model,
             model_provider=config.provider,
+            **(config.model_kwargs or {}),
         )
 
     @staticmethod
@@ -109,6 +144,7 @@ class LLMService:
     def __init__(self, config: LLMConfig):
         self.config = config
         self._llm = None
+        self._fallback = None
         self._agent = None
 
     def setup_llm(self) -> None:
@@ -116,6 +152,31 @@ class LLMService:
         if self._llm is None:
             self._llm = LLMFactory.create_llm(self.config)
 
+    def setup_candidates(self) -> Candidates:
+        """
+        Initialize the LLM and its fallback, paired with their circuit breakers.
+
+        Returns:
+            Candidates: Models to try in order with their circuit breakers
+        """
+        self.setup_llm()
+        registry = get_circuit_breakers()
+        candidates = [
+            (self._llm, registry.get(self.config.provider, self.config.model))
+        ]
+        if self.config.fallback_model and self._fallback is None:
+            try:
+                self._fallback = init_chat_model(self.config.fallback_model)
+            except Exception as e:
+                # A misconfigured fallback must not take the primary down with it
+                logger.error(
+                    f"Error creating fallback {self.config.fallback_model}: {e}"
+                )
+                self.config.fallback_model = None
+        if self._fallback is not None:
+            candidates.append((self._fallback, registry.for_model(self._fallback)))
+        return candidates
+
     def setup_agent(self) -> None:
         """Initialize agent if not already initialized."""
         if self._agent is None:
@@ -123,8 +184,70 @@ class LLMService:
 
     def get_llm_response(self, prompt: str) -> str:
         """Generate response using basic LLM."""
-        self.setup_llm()
-        return self._llm.invoke(prompt)
+        error = None
+        for llm, breaker in self.setup_candidates():
+            try:
+                breaker.acquire()
+            except CircuitOpenError as e:
+                error = e
+                continue
+            try:
+                response = llm.invoke(prompt)
+            except Exception as e:
+                breaker.record_failure(e)
+                logger.warning(f"{breaker.name} failed: {e}")
+                error = e
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            # Only the time to first chunk of streams is checked for outliers
+            breaker.record_success()
+            return response
+        raise error
+
+    def get_llm_stream(self, prompt: str) -> Iterator:
+        """Get streaming response from basic LLM."""
+        return self._guarded_stream(self.setup_candidates(), prompt)
+
+    @staticmethod
+    def _guarded_stream(candidates: Candidates, prompt: str) -> Iterator:
+        """
+        Stream from the first candidate whose circuit admits the call.
+
+        A candidate failing before its first chunk is skipped for the next
+        one; after the first chunk, errors are raised as usual.
+        """
+        error = None
+        for llm, breaker in candidates:
+            try:
+                breaker.acquire()
+            except CircuitOpenError as e:
+                error = e
+                continue
+            started = time.perf_counter()
+            responded = False
+            try:
+                for chunk in llm.stream(prompt):
+                    if not responded:
+                        responded = True
+                        breaker.record_success(time.perf_counter() - started)
+                    yield chunk
+            except Exception as e:
+                breaker.record_failure(e)
+                if responded:
+                    raise
+                logger.warning(f"{breaker.name} failed: {e}")
+                error = e
+                continue
+            except BaseException:
+                if not responded:
+                    breaker.release()
+                raise
+            if not responded:
+                breaker.record_success(time.perf_counter() - started)
+            return
+        raise error
 
     def get_agent_stream(
         self, messages: List[dict], config: Optional[dict] = None
@@ -142,15 +265,109 @@ class LLMService:
         self.setup_agent()
         return self._agent.invoke({"messages": messages}, config=config or {})
 
+    # The async counterparts below set up the LLM/agent eagerly on the calling
+    # (script) thread, since agent construction reads st.session_state, and
+    # return an awaitable or async iterator to run on the shared event loop.
+
+    def aget_llm_response(self, prompt: str) -> Awaitable:
+        """Generate response using basic LLM asynchronously."""
+        return self._aguarded_response(self.setup_candidates(), prompt)
+
+    def aget_llm_stream(self, prompt: str) -> AsyncIterator:
+        """Get asynchronous streaming response from basic LLM."""
+        return self._aguarded_stream(self.setup_candidates(), prompt)
+
+    @staticmethod
+    async def _aguarded_response(candidates: Candidates, prompt: str):
+        """Invoke the first candidate whose circuit admits the call."""
+        error = None
+        for llm, breaker in candidates:
+            try:
+                breaker.acquire()
+            except CircuitOpenError as e:
+                error = e
+                continue
+            try:
+                response = await llm.ainvoke(prompt)
+            except Exception as e:
+                breaker.record_failure(e)
+                logger.warning(f"{breaker.name} failed: {e}")
+                error = e
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            # Only the time to first chunk of streams is checked for outliers
+            breaker.record_success()
+            return response
+        raise error
+
+    @staticmethod
+    async def _aguarded_stream(candidates: Candidates, prompt: str) -> AsyncIterator:
+        """Asynchronous counterpart of _guarded_stream."""
+        error = None
+        for llm, breaker in candidates:
+            try:
+                breaker.acquire()
+            except CircuitOpenError as e:
+                error = e
+                continue
+            started = time.perf_counter()
+            responded = False
+            try:
+                async for chunk in llm.astream(prompt):
+                    if not responded:
+                        responded = True
+                        breaker.record_success(time.perf_counter() - started)
+                    yield chunk
+            except Exception as e:
+                breaker.record_failure(e)
+                if responded:
+                    raise
+                logger.warning(f"{breaker.name} failed: {e}")
+                error = e
+                continue
+            except BaseException:
+                if not responded:
+                    breaker.release()
+                raise
+            if not responded:
+                breaker.record_success(time.perf_counter() - started)
+            return
+        raise error
+
+    def aget_agent_stream(
+        self, messages: List[dict], config: Optional[dict] = None
+    ) -> AsyncIterator:
+        """Get asynchronous streaming response from agent."""
+        self.setup_agent()
+        return self._agent.astream(
+            {"messages": messages}, stream_mode="updates", config=config or {}
+        )
+
+    def aget_agent_response(
+        self, messages: List[dict], config: Optional[dict] = None
+    ) -> Awaitable:
+        """Get full response from agent asynchronously."""
+        self.setup_agent()
+        return self._agent.ainvoke({"messages": messages}, config=config or {})
+
 
 def create_llm_service(
     provider: str,
     model: str,
     system_prompt: Optional[str] = None,
     tools: Optional[List] = None,
+    model_kwargs: Optional[Dict] = None,
+    fallback_model: Optional[str] = None,
 ) -> LLMService:
     """Create an LLM service instance with specified configuration."""
     config = LLMConfig(
-        provider=provider, model=model, system_prompt=system_prompt, tools=tools
+        provider=provider,
+        model=model,
+        system_prompt=system_prompt,
+        tools=tools,
+        model_kwargs=model_kwargs,
+        fallback_model=fallback_model,
     )
     return LLMService(config)
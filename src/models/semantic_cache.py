@@ -0,0 +1,355 @@
+"""
+Semantic cache for agent answers.
+
+This module provides an offline semantic cache that serves a recent answer when
+a new prompt is a close paraphrase of a cached one. Prompts are embedded with
+hashed character n-grams and looked up in a NumPy nearest-neighbour index,
+restricted to entries about the same destination with the same qualifiers
+(negations, superlatives, months and who travels) and subject to a TTL.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("semantic_cache")
+
+# Function words carrying no meaning for matching
+STOPWORDS = frozenset(
+    """
+    a about an and any are as at be can could do does for from how i in is it its
+    me my of on or please should some tell that the there this to what which who
+    will with would you your
+    """.split()
+)
+
+# Generic travel terms that never identify a destination
+TRAVEL_TERMS = frozenset(
+    """
+    best good top worth visit travel trip time month season weather things see
+    places place hotel food around cost budget day week plan itinerary recommend
+    tips need know get when where why
+    """.split()
+)
+
+# Terms that change the answer to an otherwise identical question: negations,
+# superlatives other than the implied "best", months, seasons and who travels
+QUALIFIER_TERMS = frozenset(
+    """
+    not no never without avoid don't dont shouldn't isn't worst least most
+    cheapest priciest busiest quietest crowded hottest coldest warmest wettest
+    driest rainiest safest fastest
+    january february march april june july august september october november
+    december jan feb mar apr jun jul aug sep sept oct nov dec spring summer
+    autumn fall winter
+    kids kid children child toddler toddlers baby babies family families teens
+    couple couples honeymoon solo alone friends group seniors elderly parents
+    pets dog dogs wheelchair
+    """.split()
+)
+
+# Common paraphrases mapped onto a canonical term before embedding
+CANONICAL_TERMS = {
+    "when": "time",
+    "go": "visit",
+    "going": "visit",
+    "visiting": "visit",
+    "travelling": "travel",
+    "traveling": "travel",
+    "period": "time",
+    "months": "month",
+    "stay": "hotel",
+    "hotels": "hotel",
+    "accommodation": "hotel",
+    "accommodations": "hotel",
+    "lodging": "hotel",
+    "eat": "food",
+    "dishes": "food",
+    "cuisine": "food",
+    "restaurants": "food",
+    "costs": "cost",
+    "price": "cost",
+    "prices": "cost",
+    "expensive": "cost",
+    "days": "day",
+    "weeks": "week",
+    "recommendations": "recommend",
+    "attractions": "places",
+    "sights": "places",
+    "climate": "weather",
+}
+
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:['-][^\W\d_]+)*")
+
+
+def normalize(text: str) -> str:
+    """Lowercase text, drop stopwords and map paraphrases to canonical terms."""
+    return " ".join(
+        CANONICAL_TERMS.get(token, token)
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    )
+
+
+def extract_qualifiers(text: str) -> FrozenSet[str]:
+    """
+    Extract the qualifier terms a cached answer must match exactly.
+
+    Args:
+        text (str): User prompt
+
+    Returns:
+        FrozenSet[str]: Lowercased qualifier terms
+    """
+    return frozenset(
+        token
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token in QUALIFIER_TERMS
+    )
+
+
+def extract_destination(text: str) -> FrozenSet[str]:
+    """
+    Extract the terms identifying the destination a prompt is about.
+
+    Capitalized words are preferred; otherwise every word that is not a
+    stopword or generic travel term is used.
+
+    Args:
+        text (str): User prompt
+
+    Returns:
+        FrozenSet[str]: Lowercased destination terms
+    """
+    terms = [
+        (token, CANONICAL_TERMS.get(token.lower(), token.lower()))
+        for token in _TOKEN_PATTERN.findall(text)
+    ]
+    terms = [
+        (token, term)
+        for token, term in terms
+        if term not in STOPWORDS
+        and term not in TRAVEL_TERMS
+        and term not in QUALIFIER_TERMS
+    ]
+    capitalized = {term for token, term in terms if token[0].isupper()}
+    return frozenset(capitalized or (term for _, term in terms))
+
+
+class HashedNgramEmbedder:
+    """Offline text embedding using signed feature hashing of n-grams."""
+
+    def __init__(self, dim: int = 1024, ngram_range: tuple = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed text as an L2-normalized hashed n-gram vector.
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            np.ndarray: Unit vector of shape (dim,)
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = normalize(text).split()
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                features.extend(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+        for feature in features:
+            # crc32 is stable across processes, unlike the builtin hash
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dim] += sign
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+@dataclass
+class CacheHit:
+    """A cached answer served for a new prompt."""
+
+    answer: str
+    query: str
+    similarity: float
+
+
+class SemanticCache:
+    """Process-wide nearest-neighbour cache of agent answers."""
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        ttl: float = 86400.0,
+        max_entries: int = 2048,
+        sample_rate: float = 0.2,
+        dim: int = 1024,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sample_rate = sample_rate
+        self.embedder = HashedNgramEmbedder(dim=dim)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._queries: List[Optional[str]] = [None] * max_entries
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._destinations: List[Optional[FrozenSet[str]]] = [None] * max_entries
+        self._qualifiers: List[Optional[FrozenSet[str]]] = [None] * max_entries
+        self._next = 0
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self._sampled_hits: deque = deque(maxlen=50)
+
+    def lookup(self, query: str) -> Optional[CacheHit]:
+        """
+        Find a fresh cached answer for a close paraphrase of the query.
+
+        Args:
+            query (str): User prompt
+
+        Returns:
+            Optional[CacheHit]: The best match above the threshold, if any
+        """
+        destination = extract_destination(query)
+        qualifiers = extract_qualifiers(query)
+        vector = self.embedder.embed(query)
+        now = time.time()
+        with self._lock:
+            candidates = np.array(
+                [
+                    i
+                    for i, entry in enumerate(self._destinations)
+                    if entry is not None
+                    and entry == destination
+                    and self._qualifiers[i] == qualifiers
+                ],
+                dtype=np.int64,
+            )
+            if candidates.size:
+                candidates = candidates[self._expires[candidates] > now]
+
+            if not candidates.size:
+                self._metrics["misses"] += 1
+                return None
+
+            similarities = self._vectors[candidates] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self._metrics["misses"] += 1
+                return None
+
+            index = int(candidates[best])
+            hit = CacheHit(
+                answer=self._answers[index],
+                query=self._queries[index],
+                similarity=similarity,
+            )
+            self._metrics["hits"] += 1
+            if random.random() < self.sample_rate:
+                # Sampled hits are surfaced for manual false-hit review
+                self._sampled_hits.append(
+                    {
+                        "query": query,
+                        "cached_query": hit.query,
+                        "similarity": round(similarity, 3),
+                        "time": now,
+                    }
+                )
+
+        logger.info(f"Semantic cache hit ({similarity:.2f}) for: {query}")
+        return hit
+
+    def store(self, query: str, answer: str) -> None:
+        """
+        Cache an answer, overwriting the oldest entry once full.
+
+        Args:
+            query (str): User prompt that produced the answer
+            answer (str): Final agent answer
+        """
+        destination = extract_destination(query)
+        if not destination or not answer:
+            return
+
+        vector = self.embedder.embed(query)
+        with self._lock:
+            index = self._next % self.max_entries
+            self._next += 1
+            self._vectors[index] = vector
+            self._expires[index] = time.time() + self.ttl
+            self._queries[index] = query
+            self._answers[index] = answer
+            self._destinations[index] = destination
+            self._qualifiers[index] = extract_qualifiers(query)
+            self._metrics["stores"] += 1
+
+    def invalidate(self, destination: str) -> int:
+        """
+        Drop every cached answer about a destination.
+
+        Args:
+            destination (str): Destination name or prompt mentioning it
+
+        Returns:
+            int: Number of entries removed
+        """
+        terms = extract_destination(destination)
+        removed = 0
+        with self._lock:
+            for i, entry in enumerate(self._destinations):
+                if entry is not None and entry & terms:
+                    self._destinations[i] = None
+                    self._answers[i] = None
+                    self._queries[i] = None
+                    removed += 1
+            self._metrics["invalidations"] += removed
+
+        logger.info(f"Invalidated {removed} cached answers for {destination}")
+        return removed
+
+    def metrics(self) -> Dict[str, float]:
+        """Hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "entries": sum(1 for entry in self._destinations if entry),
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0,
+            }
+
+    def sampled_hits(self) -> List[Dict]:
+        """Recently sampled hits for reviewing false positives."""
+        with self._lock:
+            return list(self._sampled_hits)
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic cache configured from runtime.toml."""
+    config = get_shared_config("runtime.toml").get("semantic_cache", {})
+    return SemanticCache(
+        threshold=config.get("threshold", 0.85),
+        ttl=config.get("ttl", 86400.0),
+        max_entries=config.get("max_entries", 2048),
+        sample_rate=config.get("sample_rate", 0.2),
+        dim=config.get("dim", 1024),
+    )
@@ -0,0 +1,181 @@
+"""
+Search result compaction utilities.
+
+This module shrinks web search payloads before they reach the model. Result
+contents are split into sentences, stripped of boilerplate, de-duplicated
+across results, ranked against the query with a local BM25 score and cut to a
+token budget.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+# Sentences matching these patterns are page chrome rather than content
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|subscribe|newsletter|sign up|sign in|log in|all rights reserved|"
+    r"privacy policy|terms of (use|service)|javascript|advertisement|"
+    r"skip to (main )?content|share this|click here|read more|©",
+    re.IGNORECASE,
+)
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be by for from how i in is it of on or that the this to
+    was what when where which who why will with you your
+    """.split()
+)
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+|\s+[|•·]\s+")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of text (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _words(text: str) -> List[str]:
+    """Lowercased content words of a text."""
+    return [w for w in _WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+
+
+def split_sentences(text: str, min_chars: int = 25) -> List[str]:
+    """
+    Split text into cleaned sentences, dropping boilerplate and fragments.
+
+    Args:
+        text (str): Page content
+        min_chars (int): Shortest sentence worth keeping
+
+    Returns:
+        List[str]: Content sentences in their original order
+    """
+    sentences = []
+    for raw in _SENTENCE_PATTERN.split(text or ""):
+        sentence = " ".join(raw.split()).strip(" -*#>")
+        if len(sentence) < min_chars or BOILERPLATE_PATTERN.search(sentence):
+            continue
+        letters = sum(ch.isalpha() for ch in sentence)
+        if letters < len(sentence) / 2:
+            continue
+        sentences.append(sentence)
+    return sentences
+
+
+def _is_duplicate(words: set, kept: List[set], threshold: float) -> bool:
+    """Whether a sentence overlaps an already kept sentence too much."""
+    for other in kept:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def compact_results(
+    payload: Any,
+    query: str,
+    token_budget: int = 800,
+    duplicate_threshold: float = 0.8,
+) -> str:
+    """
+    Compact a Tavily search payload into ranked sentences within a token budget.
+
+    Error payloads are passed through unchanged, so that a failed search is
+    not mistaken for one without results.
+
+    Args:
+        payload (Any): Raw search payload (dict with a "results" list)
+        query (str): Search query to rank sentences against
+        token_budget (int): Maximum approximate tokens of the output
+        duplicate_threshold (float): Word-set Jaccard overlap treated as a repeat
+
+    Returns:
+        str: Compact, source-grouped search results
+    """
+    if not isinstance(payload, dict) or "error" in payload:
+        return str(payload)
+
+    results = payload.get("results", [])
+
+    # Collect unique content sentences across all results
+    candidates: List[Dict] = []
+    kept_words: List[set] = []
+    for rank, result in enumerate(results):
+        text = "\n".join(
+            part for part in (result.get("content"), result.get("raw_content")) if part
+        )
+        for position, sentence in enumerate(split_sentences(text)):
+            words = _words(sentence)
+            word_set = set(words)
+            if not word_set or _is_duplicate(word_set, kept_words, duplicate_threshold):
+                continue
+            kept_words.append(word_set)
+            candidates.append(
+                {
+                    "result": rank,
+                    "position": position,
+                    "sentence": sentence,
+                    "words": words,
+                }
+            )
+
+    # Rank sentences against the query with BM25
+    query_terms = set(_words(query))
+    document_frequency = Counter(
+        term for candidate in candidates for term in set(candidate["words"])
+    )
+    average_length = (
+        sum(len(c["words"]) for c in candidates) / len(candidates) if candidates else 1
+    )
+    k1, b = 1.2, 0.75
+    for candidate in candidates:
+        frequencies = Counter(candidate["words"])
+        length_norm = 1 - b + b * len(candidate["words"]) / average_length
+        score = 0.0
+        for term in query_terms & frequencies.keys():
+            idf = math.log(
+                1
+                + (len(candidates) - document_frequency[term] + 0.5)
+                / (document_frequency[term] + 0.5)
+            )
+            tf = frequencies[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+        # Prefer earlier results and leading sentences on ties
+        rank_score = results[candidate["result"]].get("score") or 0.0
+        candidate["score"] = (
+            score + 0.5 * rank_score + 0.1 / (1 + candidate["position"])
+        )
+
+    # Select the best sentences that fit in the budget
+    lines = []
+    used = 0
+    answer = payload.get("answer")
+    if answer:
+        lines.append(f"Answer: {answer}")
+        used += estimate_tokens(lines[0])
+
+    selected: Dict[int, List[Dict]] = {}
+    for candidate in sorted(candidates, key=lambda c: c["score"], reverse=True):
+        cost = estimate_tokens(candidate["sentence"]) + 1
+        if candidate["result"] not in selected:
+            result = results[candidate["result"]]
+            cost += estimate_tokens(
+                f"{result.get('title', '')} {result.get('url', '')}"
+            )
+        if used + cost > token_budget:
+            continue
+        used += cost
+        selected.setdefault(candidate["result"], []).append(candidate)
+
+    # Group the selected sentences by source, in original order
+    for rank in sorted(selected):
+        result = results[rank]
+        lines.append(
+            f"[{rank + 1}] {result.get('title', '')} ({result.get('url', '')})"
+        )
+        for candidate in sorted(selected[rank], key=lambda c: c["position"]):
+            lines.append(f"- {candidate['sentence']}")
+
+    return "\n".join(lines) if lines else "No relevant results found."
@@ -0,0 +1,277 @@
+"""
+Out-of-core data helpers for generated tools.
+
+This module is exposed to the code generated on the Customized Tools page as
+`data_helpers`. Uploads and local files are parsed once into Parquet files
+keyed by a hash of their content, columns are read through memory maps and
+large aggregations run chunk by chunk with dask, so generated data tools stay
+responsive on files larger than RAM.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Union
+
+import dask.dataframe as dd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("data_helpers")
+
+Source = Union[str, Path, IO[bytes]]
+
+# Content hashes of already seen sources, keyed by a cheap identity
+_hashes: Dict[tuple, str] = {}
+_lock = threading.Lock()
+
+
+def get_data_helpers_config() -> Dict[str, Any]:
+    """Get the data helper settings from runtime.toml."""
+    return get_shared_config("runtime.toml").get("data_helpers", {})
+
+
+def _cache_dir() -> Path:
+    path = Path(get_data_helpers_config().get("cache_dir", ".cache/data"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _block_size() -> int:
+    return int(get_data_helpers_config().get("block_size_mb", 64) * 1024 * 1024)
+
+
+def _identity(source: Source) -> Optional[tuple]:
+    """Cheap identity of a source, so unchanged files are hashed only once."""
+    if isinstance(source, (str, Path)):
+        stat = os.stat(source)
+        return ("path", str(Path(source).resolve()), stat.st_size, stat.st_mtime_ns)
+    # Streamlit uploads carry an ID that changes whenever the file does
+    file_id = getattr(source, "file_id", None)
+    return ("upload", file_id) if file_id is not None else None
+
+
+def content_hash(source: Source) -> str:
+    """
+    Hash the content of a file or upload, reading it in blocks.
+
+    Args:
+        source (Source): File path or binary file-like object (e.g. an upload)
+
+    Returns:
+        str: SHA-256 hex digest of the content
+    """
+    identity = _identity(source)
+    with _lock:
+        if identity is not None and identity in _hashes:
+            return _hashes[identity]
+
+    digest = hashlib.sha256()
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            while block := f.read(_block_size()):
+                digest.update(block)
+    else:
+        position = source.tell()
+        source.seek(0)
+        while block := source.read(_block_size()):
+            digest.update(block)
+        source.seek(position)
+
+    if identity is not None:
+        with _lock:
+            _hashes[identity] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def _evict(keep: Path) -> None:
+    """
+    Trim the Parquet cache to its size and age limits.
+
+    Files are removed least recently used first; files used within the last
+    minute (e.g. still being read lazily by dask) and `keep` are spared.
+    Partial files left behind by crashed conversions are removed once stale.
+
+    Args:
+        keep (Path): Cache file that was just used
+    """
+    config = get_data_helpers_config()
+    budget = config.get("max_cache_mb", 4096) * 1024 * 1024
+    max_age = config.get("max_age", 604800)
+    now = time.time()
+
+    entries = []
+    for path in keep.parent.iterdir():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if path.suffix == ".partial":
+            if now - stat.st_mtime > 3600:
+                path.unlink(missing_ok=True)
+        elif path.suffix == ".parquet":
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for used, size, path in sorted(entries):
+        if total <= budget and now - used <= max_age:
+            break
+        if path == keep or now - used < 60:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.info(f"Evicted {path.name} from the data cache ({size} bytes)")
+
+
+def to_parquet(source: Source, **csv_options: Any) -> Path:
+    """
+    Convert a CSV or Parquet source to a cached Parquet file.
+
+    Input is read in blocks (CSV with Arrow, Parquet batch by batch) and
+    written batch by batch, so conversion never holds the whole file in
+    memory. The result is keyed by the content hash, so the same upload is
+    only parsed once, and the cache is trimmed to its size and age limits.
+
+    Args:
+        source (Source): CSV/Parquet path or binary file-like object
+        **csv_options (Any): Options for pyarrow.csv.ReadOptions
+            (e.g. column_names, skip_rows)
+
+    Returns:
+        Path: Path of the cached Parquet file
+    """
+    name = str(getattr(source, "name", source))
+    if name.endswith(".parquet") and isinstance(source, (str, Path)):
+        # Local Parquet files are already in the cached format
+        return Path(source)
+
+    key = content_hash(source)
+    if csv_options:
+        # Different parse options of the same file are cached separately
+        options = repr(sorted(csv_options.items())).encode("utf-8")
+        key = f"{key}-{hashlib.sha256(options).hexdigest()[:12]}"
+    target = _cache_dir() / f"{key}.parquet"
+    if target.exists():
+        # The modification time doubles as the last use for eviction
+        os.utime(target)
+        return target
+
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    if name.endswith(".parquet"):
+        parquet = pq.ParquetFile(source)
+        schema, batches = parquet.schema_arrow, parquet.iter_batches()
+    else:
+        reader = pv.open_csv(
+            source,
+            read_options=pv.ReadOptions(block_size=_block_size(), **csv_options),
+        )
+        schema, batches = reader.schema, reader
+
+    # Write to a unique temporary file so concurrent conversions never clash
+    partial = target.with_name(f"{target.stem}.{uuid.uuid4().hex}.partial")
+    try:
+        with pq.ParquetWriter(partial, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        partial.replace(target)
+    finally:
+        partial.unlink(missing_ok=True)
+    logger.info(f"Converted {name} to {target}")
+    _evict(keep=target)
+    return target
+
+
+def schema(source: Source) -> pa.Schema:
+    """Column names and types of a source, read from Parquet metadata only."""
+    return pq.read_schema(to_parquet(source))
+
+
+def row_count(source: Source) -> int:
+    """Number of rows of a source, read from Parquet metadata only."""
+    return pq.ParquetFile(to_parquet(source)).metadata.num_rows
+
+
+def read_columns(
+    source: Source, columns: Optional[List[str]] = None, rows: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Read selected columns through a memory map.
+
+    Args:
+        source (Source): CSV/Parquet path or binary file-like object
+        columns (List[str], optional): Columns to read; all when omitted
+        rows (int, optional): Only read the first rows, e.g. for a preview
+
+    Returns:
+        pd.DataFrame: The requested columns
+    """
+    path = to_parquet(source)
+    if rows is None:
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    parquet = pq.ParquetFile(path, memory_map=True)
+    batches = []
+    remaining = rows
+    for batch in parquet.iter_batches(batch_size=min(rows, 65536), columns=columns):
+        batches.append(batch.slice(0, remaining))
+        remaining -= len(batches[-1])
+        if remaining <= 0:
+            break
+    if not batches:
+        return parquet.schema_arrow.empty_table().to_pandas()
+    return pa.Table.from_batches(batches).to_pandas()
+
+
+def preview(source: Source, rows: int = 100) -> pd.DataFrame:
+    """First rows of a source, without reading the rest of the file."""
+    return read_columns(source, rows=rows)
+
+
+def read_dask(source: Source, columns: Optional[List[str]] = None) -> dd.DataFrame:
+    """
+    Open a source as a lazily evaluated, chunked dask DataFrame.
+
+    Args:
+        source (Source): CSV/Parquet path or binary file-like object
+        columns (List[str], optional): Columns to load
+
+    Returns:
+        dd.DataFrame: Dask DataFrame; call .compute() on small results only
+    """
+    return dd.read_parquet(to_parquet(source), columns=columns)
+
+
+def aggregate(
+    source: Source,
+    by: Union[str, List[str]],
+    agg: Dict[str, Union[str, List[str]]],
+) -> pd.DataFrame:
+    """
+    Group and aggregate a source chunk by chunk with dask.
+
+    Args:
+        source (Source): CSV/Parquet path or binary file-like object
+        by (Union[str, List[str]]): Column(s) to group by
+        agg (Dict[str, Union[str, List[str]]]): Aggregations per column,
+            e.g. {"amount": ["sum", "mean"]}
+
+    Returns:
+        pd.DataFrame: Aggregated result
+    """
+    keys = [by] if isinstance(by, str) else list(by)
+    frame = read_dask(source, columns=list(dict.fromkeys(keys + list(agg))))
+    return frame.groupby(keys).agg(agg).compute()
+
+
+def describe(source: Source, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Summary statistics of numeric columns, computed chunk by chunk."""
+    return read_dask(source, columns=columns).describe().compute()
@@ -1,13 +1,222 @@
 """
 Web Search Tool using TavilySearch
+
+Searches can be prefetched speculatively: the agent's turn starts a search
+for the user's prompt alongside its first model call, and a matching
+web_search tool call is then served from the prefetched result.
 """
 
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
 from langchain.tools import tool
 from langchain_tavily import TavilySearch
 
+from src.tools.compaction import compact_results
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("web_search")
+
+# Words ignored when matching a tool query against the prefetched prompt
+STOPWORDS = frozenset(
+    "a an and are at be best can do for from how i in is it me my of on or "
+    "should the to what when where which with you".split()
+)
+
+# Prefetched search of the agent turn running in the current context
+_current_prefetch: ContextVar[Optional["Prefetch"]] = ContextVar(
+    "current_prefetch", default=None
+)
+
+
+def get_web_search_config() -> Dict[str, Any]:
+    """Get the web search settings from runtime.toml."""
+    return get_shared_config("runtime.toml").get("web_search", {})
+
+
+def run_search(query: str, limit: int = 5) -> Any:
+    """Run a TavilySearch query and return the raw results."""
+    search = TavilySearch(max_results=limit)
+    return search.invoke(f"""{query}""")
+
+
+def terms(text: str) -> set:
+    """Lowercase words of a text without stopwords."""
+    return set(re.findall(r"[a-z0-9]+", text.lower())) - STOPWORDS
+
+
+@dataclass
+class Prefetch:
+    """A speculative search started for an agent turn."""
+
+    query: str
+    limit: int
+    future: Optional[Future] = None
+    duration: float = 0.0
+    served: bool = False
+
+
+class SearchPrefetcher:
+    """Bounded, accounted speculative web searches."""
+
+    def __init__(
+        self,
+        search: Callable[[str, int], Any],
+        max_inflight: int = 4,
+        match_threshold: float = 0.6,
+        max_query_chars: int = 400,
+    ):
+        self.search = search
+        self.match_threshold = match_threshold
+        self.max_query_chars = max_query_chars
+        self.counters: Counter = Counter()
+        self.wasted_seconds = 0.0
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_inflight, thread_name_prefix="search-prefetch"
+        )
+        self._lock = threading.Lock()
+
+    def _count(self, event: str) -> None:
+        with self._lock:
+            self.counters[event] += 1
+
+    def start(self, query: str, limit: int = 5) -> Optional[Prefetch]:
+        """
+        Start a search in the background if a prefetch slot is free.
 
-@tool
-def web_search(query: str, limit: int = 5) -> str:
+        Args:
+            query (str): Query to search, usually the user's prompt
+            limit (int): Maximum number of results
+
+        Returns:
+            Optional[Prefetch]: The started prefetch, or None when all slots
+                are taken
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("skipped")
+            return None
+        prefetch = Prefetch(query=query[: self.max_query_chars], limit=limit)
+        prefetch.future = self._executor.submit(self._run, prefetch)
+        self._count("launched")
+        return prefetch
+
+    def _run(self, prefetch: Prefetch) -> Any:
+        started = time.perf_counter()
+        try:
+            return self.search(prefetch.query, prefetch.limit)
+        finally:
+            prefetch.duration = time.perf_counter() - started
+            self._slots.release()
+
+    def match(self, query: str, prefetch: Prefetch) -> float:
+        """Share of the tool query's words found in the prefetched query."""
+        wanted = terms(query)
+        if not wanted:
+            return 0.0
+        return len(wanted & terms(prefetch.query)) / len(wanted)
+
+    def claim(self, query: str, limit: int = 5) -> Optional[Any]:
+        """
+        Serve a tool call from the current turn's prefetch if it matches.
+
+        Each prefetch is served at most once, waiting for it if it is still
+        in flight.
+
+        Args:
+            query (str): Query requested by the model
+            limit (int): Maximum number of results requested
+
+        Returns:
+            Optional[Any]: The prefetched results, or None to search normally
+        """
+        prefetch = _current_prefetch.get()
+        if prefetch is None or prefetch.served or limit > prefetch.limit:
+            return None
+        if self.match(query, prefetch) < self.match_threshold:
+            self._count("mismatched")
+            return None
+
+        prefetch.served = True
+        try:
+            results = prefetch.future.result()
+        except Exception as e:
+            logger.warning(f"Prefetched search failed, searching again: {e}")
+            self._count("failed")
+            return None
+        self._count("served")
+        logger.info(f"Served {query!r} from the search prefetched for the turn")
+        if isinstance(results, dict) and isinstance(results.get("results"), list):
+            results = {**results, "results": results["results"][:limit]}
+        return results
+
+    def finish(self, prefetch: Prefetch) -> None:
+        """Account for a turn's prefetch once the turn is over."""
+        if prefetch.served:
+            return
+        if prefetch.future.cancel():
+            # The search never ran, so its slot is not released by _run
+            self._slots.release()
+            self._count("cancelled")
+            return
+        # A search still in flight is accounted for when it completes
+        prefetch.future.add_done_callback(lambda _: self._waste(prefetch))
+
+    def _waste(self, prefetch: Prefetch) -> None:
+        with self._lock:
+            self.counters["unused"] += 1
+            self.wasted_seconds += prefetch.duration
+        logger.info(f"Prefetched search {prefetch.query!r} unused: {self.stats()}")
+
+    async def wrap(self, query: str, stream: AsyncIterator) -> AsyncIterator:
+        """
+        Prefetch a search while an agent turn streams.
+
+        Args:
+            query (str): Query to prefetch, usually the user's prompt
+            stream (AsyncIterator): Agent stream of the turn
+
+        Yields:
+            The events of the stream, unchanged
+        """
+        prefetch = self.start(query)
+        # Jobs run in their own task, so the prefetch is only visible to the
+        # tool calls of this turn
+        _current_prefetch.set(prefetch)
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            if prefetch is not None:
+                self.finish(prefetch)
+
+    def stats(self) -> Dict[str, Any]:
+        """Prefetch counters and the search time spent on unused prefetches."""
+        with self._lock:
+            return {**self.counters, "wasted_seconds": self.wasted_seconds}
+
+
+@lru_cache(maxsize=1)
+def get_search_prefetcher() -> SearchPrefetcher:
+    """Get the process-wide search prefetcher configured from runtime.toml."""
+    config = get_web_search_config()
+    return SearchPrefetcher(
+        run_search,
+        max_inflight=config.get("prefetch_max_inflight", 4),
+        match_threshold=config.get("prefetch_match", 0.6),
+    )
+
+
+@tool(response_format="content_and_artifact")
+def web_search(query: str, limit: int = 5) -> Tuple[str, Any]:
     """
     Perform a web search using TavilySearch.
     Args:
@@ -17,5 +226,20 @@ def web_search(query: str, limit: int = 5) -> str:
         str: The search results.
     """
 
-    search = TavilySearch(max_results=limit)
-    return search.invoke(f"""{query}""")
+    prefetched = get_search_prefetcher().claim(query, limit)
+    results = prefetched if prefetched is not None else run_search(query, limit)
+
+    # Only the compacted results reach the model; the raw payload is kept as
+    # the tool message artifact for display
+    config = get_web_search_config()
+    if not config.get("compaction", True):
+        return str(results), results
+    return (
+        compact_results(
+            results,
+            query,
+            token_budget=config.get("token_budget", 800),
+            duplicate_threshold=config.get("duplicate_threshold", 0.8),
+        ),
+        results,
+    )
@@ -0,0 +1,388 @@
+"""
+Record/replay cassettes for outgoing HTTP traffic.
+
+This module captures provider and search calls made through httpx (Groq,
+Anthropic, OpenAI clients) and requests (Tavily, Gemini over REST) into JSON
+cassette files, together with the arrival time of every response chunk. In
+replay mode the same interactions are served offline, optionally reproducing
+the recorded latency profile for realistic end-to-end timings.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import requests
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger("cassette")
+
+MODES = ("replay", "record", "off")
+
+# Credentials scrubbed from recorded URLs and JSON bodies
+SECRET_FIELDS = frozenset({"api_key", "key", "token", "access_token"})
+
+# Headers kept in cassettes; bodies are stored decoded so encoding headers go
+KEPT_HEADERS = frozenset({"content-type", "retry-after"})
+
+
+class CassetteError(Exception):
+    """Raised when a request cannot be served from a cassette."""
+
+
+def _scrub_url(url: str) -> str:
+    """Remove credentials from a URL query string."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in SECRET_FIELDS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _scrub_body(body: bytes) -> str:
+    """Decode a request body, dropping credential fields from JSON payloads."""
+    text = body.decode("utf-8", errors="replace") if body else ""
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in SECRET_FIELDS}
+    return json.dumps(payload, sort_keys=True)
+
+
+def _decode_chunks(chunks: List[Tuple[float, bytes]]) -> List[List]:
+    """Decode timed byte chunks to text, tolerating split multi-byte characters."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    decoded = [[round(offset, 4), decoder.decode(chunk)] for offset, chunk in chunks]
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        decoded.append([decoded[-1][0] if decoded else 0.0, tail])
+    return decoded
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Byte stream replaying recorded chunks, optionally at their recorded pace."""
+
+    def __init__(self, chunks: List[List], latency_scale: float):
+        self.chunks = chunks
+        self.latency_scale = latency_scale
+
+    def __iter__(self):
+        started = time.perf_counter()
+        for offset, text in self.chunks:
+            delay = offset * self.latency_scale - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            yield text.encode("utf-8")
+
+    async def __aiter__(self):
+        started = time.perf_counter()
+        for offset, text in self.chunks:
+            delay = offset * self.latency_scale - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text.encode("utf-8")
+
+
+class Cassette:
+    """
+    Context manager recording or replaying HTTP interactions to a JSON file.
+
+    Requests are matched on method, scrubbed URL and (optionally) scrubbed
+    body; repeated identical requests are served in recorded order.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency_scale: float = 0.0,
+        match_body: bool = True,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.match_body = match_body
+        self.interactions: List[Dict[str, Any]] = []
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._patches: List = []
+
+    # --------------------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------------------
+    def __enter__(self) -> "Cassette":
+        if self.mode == "replay":
+            if not self.path.exists():
+                raise CassetteError(f"Cassette not found: {self.path}")
+            with open(self.path) as f:
+                self.interactions = json.load(f)["interactions"]
+            for interaction in self.interactions:
+                self._queues[self._key(interaction["request"])].append(interaction)
+
+        if self.mode != "off":
+            self._patch()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for patcher in reversed(self._patches):
+            patcher.stop()
+        self._patches.clear()
+
+        if self.mode == "record" and exc_info[0] is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(
+                    {"version": 1, "interactions": self.interactions}, f, indent=2
+                )
+            logger.info(
+                f"Recorded {len(self.interactions)} interactions to {self.path}"
+            )
+
+    def _patch(self) -> None:
+        """Install the transport hooks for httpx and requests."""
+        cassette = self
+        httpx_send = httpx.Client.send
+        httpx_async_send = httpx.AsyncClient.send
+        requests_send = requests.Session.send
+
+        def client_send(client, request, *args, stream=False, **kwargs):
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                response = httpx_send(client, request, *args, stream=True, **kwargs)
+                response = cassette._record_httpx(request, response, started)
+            else:
+                response = cassette._replay_httpx(request, request.read())
+            if not stream:
+                response.read()
+            return response
+
+        async def async_client_send(client, request, *args, stream=False, **kwargs):
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                response = await httpx_async_send(
+                    client, request, *args, stream=True, **kwargs
+                )
+                response = await cassette._arecord_httpx(request, response, started)
+            else:
+                response = cassette._replay_httpx(request, await request.aread())
+            if not stream:
+                await response.aread()
+            return response
+
+        def session_send(session, request, **kwargs):
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                response = requests_send(session, request, **{**kwargs, "stream": True})
+                return cassette._record_requests(request, response, started)
+            return cassette._replay_requests(request)
+
+        for target, replacement in (
+            ("httpx.Client.send", client_send),
+            ("httpx.AsyncClient.send", async_client_send),
+            ("requests.Session.send", session_send),
+        ):
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self._patches.append(patcher)
+
+    # --------------------------------------------------------------------
+    # Matching
+    # --------------------------------------------------------------------
+    def _key(self, request: Dict[str, Any]) -> str:
+        """Matching key of a recorded request."""
+        parts = [request["method"], request["url"]]
+        if self.match_body:
+            parts.append(request["body"])
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _describe(self, method: str, url: str, body: bytes) -> Dict[str, Any]:
+        """Scrubbed description of an outgoing request."""
+        return {"method": method, "url": _scrub_url(url), "body": _scrub_body(body)}
+
+    def _next(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Pop the next recorded interaction matching a request."""
+        with self._lock:
+            queue = self._queues.get(self._key(request))
+            if not queue:
+                raise CassetteError(
+                    f"No recorded interaction for {request['method']} "
+                    f"{request['url']} in {self.path}"
+                )
+            return queue.popleft()
+
+    def _store(self, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Append a recorded interaction."""
+        with self._lock:
+            self.interactions.append({"request": request, "response": response})
+
+    # --------------------------------------------------------------------
+    # httpx
+    # --------------------------------------------------------------------
+    def _httpx_interaction(
+        self, response: httpx.Response, chunks: List, elapsed: float
+    ) -> Dict[str, Any]:
+        return {
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS
+            },
+            "chunks": _decode_chunks(chunks),
+            "elapsed": round(elapsed, 4),
+        }
+
+    def _record_httpx(
+        self, request: httpx.Request, response: httpx.Response, started: float
+    ) -> httpx.Response:
+        chunks = [
+            (time.perf_counter() - started, chunk) for chunk in response.iter_bytes()
+        ]
+        response.close()
+        interaction = self._httpx_interaction(
+            response, chunks, time.perf_counter() - started
+        )
+        description = self._describe(request.method, str(request.url), request.read())
+        self._store(description, interaction)
+        return self._build_httpx(request, interaction, latency_scale=0.0)
+
+    async def _arecord_httpx(
+        self, request: httpx.Request, response: httpx.Response, started: float
+    ) -> httpx.Response:
+        chunks = []
+        async for chunk in response.aiter_bytes():
+            chunks.append((time.perf_counter() - started, chunk))
+        await response.aclose()
+        interaction = self._httpx_interaction(
+            response, chunks, time.perf_counter() - started
+        )
+        description = self._describe(
+            request.method, str(request.url), await request.aread()
+        )
+        self._store(description, interaction)
+        return self._build_httpx(request, interaction, latency_scale=0.0)
+
+    def _replay_httpx(self, request: httpx.Request, body: bytes) -> httpx.Response:
+        description = self._describe(request.method, str(request.url), body)
+        interaction = self._next(description)["response"]
+        return self._build_httpx(request, interaction, self.latency_scale)
+
+    def _build_httpx(
+        self, request: httpx.Request, interaction: Dict[str, Any], latency_scale: float
+    ) -> httpx.Response:
+        response = httpx.Response(
+            status_code=interaction["status"],
+            headers=interaction["headers"],
+            stream=_ReplayStream(interaction["chunks"], latency_scale),
+            request=request,
+        )
+        response.elapsed = timedelta(seconds=interaction["elapsed"] * latency_scale)
+        return response
+
+    # --------------------------------------------------------------------
+    # requests
+    # --------------------------------------------------------------------
+    def _record_requests(
+        self,
+        request: requests.PreparedRequest,
+        response: requests.Response,
+        started: float,
+    ) -> requests.Response:
+        chunks = [
+            (time.perf_counter() - started, chunk)
+            for chunk in response.iter_content(chunk_size=None)
+        ]
+        response.close()
+        interaction = {
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS
+            },
+            "chunks": _decode_chunks(chunks),
+            "elapsed": round(time.perf_counter() - started, 4),
+        }
+        self._store(self._describe_requests(request), interaction)
+        return self._build_requests(request, interaction)
+
+    def _replay_requests(self, request: requests.PreparedRequest) -> requests.Response:
+        interaction = self._next(self._describe_requests(request))["response"]
+        if self.latency_scale and interaction["chunks"]:
+            # requests bodies are consumed whole, so only the total is replayed
+            time.sleep(interaction["chunks"][-1][0] * self.latency_scale)
+        return self._build_requests(request, interaction)
+
+    def _describe_requests(self, request: requests.PreparedRequest) -> Dict[str, Any]:
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return self._describe(request.method, request.url, body)
+
+    def _build_requests(
+        self, request: requests.PreparedRequest, interaction: Dict[str, Any]
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.headers.update(interaction["headers"])
+        response._content = "".join(text for _, text in interaction["chunks"]).encode(
+            "utf-8"
+        )
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def cassette_from_env(path: str) -> Cassette:
+    """
+    Create a cassette configured from the environment.
+
+    CASSETTE_MODE selects replay (default), record or off (live calls), and
+    CASSETTE_LATENCY scales the recorded latency on replay (0 disables it).
+
+    Args:
+        path (str): Cassette file path
+
+    Returns:
+        Cassette: Configured, not yet entered cassette
+    """
+    return Cassette(
+        path,
+        mode=os.environ.get("CASSETTE_MODE", "replay"),
+        latency_scale=float(os.environ.get("CASSETTE_LATENCY", "0")),
+    )
+
+
+def timing_profile(path: str) -> Optional[Dict[str, float]]:
+    """
+    Summarize the recorded timing of a cassette.
+
+    Args:
+        path (str): Cassette file path
+
+    Returns:
+        Optional[Dict[str, float]]: Request count, total and first-chunk latency
+    """
+    if not Path(path).exists():
+        return None
+    with open(path) as f:
+        interactions = json.load(f)["interactions"]
+    responses = [interaction["response"] for interaction in interactions]
+    return {
+        "requests": len(responses),
+        "total_seconds": round(sum(r["elapsed"] for r in responses), 4),
+        "first_chunk_seconds": round(
+            sum(r["chunks"][0][0] for r in responses if r["chunks"]), 4
+        ),
+    }
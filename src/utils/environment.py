@@ -2,68 +2,120 @@
 Environment initialization utilities.
 
 This module handles the initialization and setup of environment variables
-from Streamlit secrets and configuration files.
+from Streamlit secrets and configuration files. Process-wide work runs once in
+bootstrap_process, while initialize_environment only attaches lightweight
+references to each new session.
 """
 
 import os
 import uuid
+from typing import Any, Dict
 
 import streamlit as st
+from streamlit.errors import StreamlitSecretNotFoundError
 
-from src.utils.load import load_config
+from src.utils.event_loop import get_event_loop
+from src.utils.jobs import get_job_manager
+from src.utils.load import get_shared_config
+from src.utils.session_state import get_session_manager, get_session_store
 
 from .logger import setup_logger
 
+# Session state keys referencing the shared configuration files
+CONFIG_FILES = {
+    "instructions_config": "instructions.toml",
+    "model_config": "models.toml",
+    "middleware_config": "middleware.toml",
+    "runtime_config": "runtime.toml",
+}
+
 
 @st.cache_resource
-def initialize_environment() -> bool:
+def bootstrap_process() -> Dict[str, Any]:
     """
-    Initialize the application environment from secrets and configuration.
-    Uses streamlit secrets for sensitive data and configuration files for
-    application settings.
+    Bootstrap the process once: export secrets, load shared configuration and
+    start the shared services. Streamlit runs this a single time even under
+    concurrent first visits.
 
     Returns:
-        bool: True if initialization was successful
+        Dict[str, Any]: Shared configuration keyed by session state name
     """
-    # Set up logger for environment initialization
     logger = setup_logger("environment")
-    logger.info("Starting environment initialization")
+    logger.info("Starting process bootstrap")
 
-    # Load environment variables from streamlit secrets
     try:
-        for external_app in st.secrets.keys():
+        # Load environment variables from streamlit secrets, if usable; keys
+        # may also come from the environment (e.g. placeholders for replays)
+        try:
+            secrets = {app: dict(st.secrets[app]) for app in st.secrets.keys()}
+        except StreamlitSecretNotFoundError as e:
+            logger.warning(f"No usable secrets, using the environment: {str(e)}")
+            secrets = {}
+        for external_app, values in secrets.items():
             logger.info(f"Loading environment variables for {external_app}")
-            for key, value in st.secrets[external_app].items():
+            for key, value in values.items():
                 if key == "API_KEY":
                     key = f"{external_app}_{key}"
                 logger.debug(f"Setting {key}")
                 os.environ[key] = value
 
-        # Check if page is being initialized for the first time
-        if "home_page_initialized" not in st.session_state:
-            logger.info("Setting up home page")
-            st.session_state.home_page_initialized = True
+        # Load configuration files shared read-only by every session
+        configs = {}
+        for name, file_name in CONFIG_FILES.items():
+            logger.info(f"Loading {file_name}")
+            configs[name] = get_shared_config(file_name)
 
-        # If no session ID exists, create one
-        if "session_id" not in st.session_state:
-            st.session_state.session_id = str(uuid.uuid4())
+        # Start the shared services ahead of the first request
+        get_event_loop()
+        get_job_manager()
+        get_session_manager()
+        get_session_store()
 
-        # Load configuration files
-        if "instructions_config" not in st.session_state:
-            logger.info("Loading instructions configuration")
-            st.session_state.instructions_config = load_config("instructions.toml")
+        logger.info("Process bootstrap completed successfully")
+        return configs
 
-        if "model_config" not in st.session_state:
-            logger.info("Loading model configuration")
-            st.session_state.model_config = load_config("models.toml")
+    except Exception as e:
+        logger.error(f"Failed to bootstrap process: {str(e)}")
+        raise
 
-        if "middleware_config" not in st.session_state:
-            logger.info("Loading middleware configuration")
-            st.session_state.middleware_config = load_config("middleware.toml")
 
-        logger.info("Environment initialization completed successfully")
-        return True
+def initialize_environment() -> bool:
+    """
+    Initialize the current session. Idempotent and cheap: the process is
+    bootstrapped once and sessions only receive references to shared state.
 
-    except Exception as e:
-        logger.error(f"Failed to initialize environment: {str(e)}")
-        raise
+    Returns:
+        bool: True if initialization was successful
+    """
+    configs = bootstrap_process()
+
+    # If no session ID exists, this is the first run of a new session
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.home_page_initialized = True
+        logger = setup_logger("environment")
+        logger.info(f"Initialized session {st.session_state.session_id}")
+
+        # A resume token from the URL copies the state of the session it was
+        # issued for; the internal session ID never leaves the server
+        if (store := get_session_store()) is not None:
+            token = st.query_params.get("resume")
+            if token is not None and not store.resume(token, st.session_state):
+                logger.warning("Ignoring an unknown or expired resume token")
+            try:
+                st.session_state.resume_token = store.issue_token(
+                    st.session_state.session_id
+                )
+            except Exception as e:
+                logger.error(f"Failed to issue a resume token: {str(e)}")
+
+    # Keep the resume token in the URL so that any replica can resume a copy
+    token = st.session_state.get("resume_token")
+    if token is not None and st.query_params.get("resume") != token:
+        st.query_params["resume"] = token
+
+    for name, config in configs.items():
+        if name not in st.session_state:
+            st.session_state[name] = config
+
+    return True
@@ -0,0 +1,50 @@
+"""
+Process-wide asyncio event loop utilities.
+
+This module runs a single asyncio event loop on a dedicated daemon thread so
+that async LLM and agent calls from every Streamlit session share one I/O loop.
+Page scripts never block on it: they submit work through the job manager
+(src.utils.jobs) and poll the results.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the shared event loop, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running process-wide event loop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="llm-event-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> Future:
+    """
+    Schedule a coroutine on the shared event loop without waiting for it.
+
+    Args:
+        coro (Coroutine): Coroutine to schedule
+
+    Returns:
+        Future: Thread-safe future resolving to the coroutine result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
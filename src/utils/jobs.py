@@ -0,0 +1,167 @@
+"""
+Background job utilities.
+
+This module runs long agent and summarization streams as background jobs on
+the shared event loop, keyed by session and thread ID. Each job buffers its
+events so a page can reattach to it after a rerun or navigation and poll it
+incrementally. Jobs that nobody polls for a while are cancelled.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.utils.event_loop import get_event_loop, submit
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("jobs")
+
+JobKey = Tuple[str, str]
+
+
+@dataclass
+class Job:
+    """A background stream whose events are buffered for polling."""
+
+    key: JobKey
+    status: str = "running"
+    error: Optional[str] = None
+    events: List[Any] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    last_polled: float = field(default_factory=time.monotonic)
+    future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has stopped producing events."""
+        return self.status != "running"
+
+    def read(self, cursor: int) -> List[Any]:
+        """Return events buffered since `cursor` and mark the job as polled."""
+        self.last_polled = time.monotonic()
+        return self.events[cursor:]
+
+
+class JobManager:
+    """Process-wide registry of background jobs."""
+
+    def __init__(
+        self,
+        abandon_timeout: float = 120.0,
+        retention: float = 600.0,
+        reap_interval: float = 10.0,
+    ):
+        self.abandon_timeout = abandon_timeout
+        self.retention = retention
+        self.reap_interval = reap_interval
+        self._jobs: Dict[JobKey, Job] = {}
+        self._lock = threading.Lock()
+        get_event_loop().call_soon_threadsafe(self._schedule_reap)
+
+    def submit(self, session_id: str, thread_id: str, stream: AsyncIterator) -> Job:
+        """
+        Submit a stream as a background job unless one is already in flight.
+
+        Args:
+            session_id (str): Session owning the job
+            thread_id (str): Conversation thread within the session
+            stream (AsyncIterator): Async iterator producing the job events
+
+        Returns:
+            Job: The new job, or the in-flight job for the same key
+        """
+        key = (session_id, thread_id)
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None and not existing.finished:
+                logger.warning(f"Job already running for {key}, reattaching")
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    submit(aclose())
+                return existing
+
+            job = Job(key=key)
+            self._jobs[key] = job
+            job.future = submit(self._run(job, stream))
+
+        logger.info(f"Submitted background job for {key}")
+        return job
+
+    def get(self, session_id: str, thread_id: str) -> Optional[Job]:
+        """Get the job for a session and thread, if any."""
+        with self._lock:
+            return self._jobs.get((session_id, thread_id))
+
+    def has_running(self, session_id: str) -> bool:
+        """Whether any job of the session is still running."""
+        with self._lock:
+            return any(
+                key[0] == session_id and not job.finished
+                for key, job in self._jobs.items()
+            )
+
+    def release(self, job: Job) -> None:
+        """Forget a finished job once its events have been consumed."""
+        with self._lock:
+            if self._jobs.get(job.key) is job and job.finished:
+                del self._jobs[job.key]
+
+    def cancel(self, job: Job) -> None:
+        """Cancel a running job."""
+        if job.future is not None and not job.finished:
+            logger.info(f"Cancelling background job for {job.key}")
+            if job.future.cancel():
+                job.status = "cancelled"
+
+    async def _run(self, job: Job, stream: AsyncIterator) -> None:
+        """Drain the stream into the job buffer."""
+        try:
+            async for event in stream:
+                job.events.append(event)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Background job {job.key} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+
+    def _schedule_reap(self) -> None:
+        """Run the reaper and schedule its next pass on the event loop."""
+        try:
+            self._reap()
+        finally:
+            get_event_loop().call_later(self.reap_interval, self._schedule_reap)
+
+    def _reap(self) -> None:
+        """Cancel abandoned jobs and drop finished jobs past their retention."""
+        now = time.monotonic()
+        with self._lock:
+            jobs = list(self._jobs.values())
+
+        for job in jobs:
+            idle = now - job.last_polled
+            if not job.finished and idle > self.abandon_timeout:
+                logger.warning(f"Job {job.key} abandoned after {idle:.0f}s")
+                self.cancel(job)
+            elif job.finished and idle > self.retention:
+                with self._lock:
+                    if self._jobs.get(job.key) is job:
+                        del self._jobs[job.key]
+
+
+@lru_cache(maxsize=1)
+def get_job_manager() -> JobManager:
+    """Get the process-wide job manager configured from runtime.toml."""
+    config = get_shared_config("runtime.toml").get("jobs", {})
+    return JobManager(
+        abandon_timeout=config.get("abandon_timeout", 120.0),
+        retention=config.get("retention", 600.0),
+        reap_interval=config.get("reap_interval", 10.0),
+    )
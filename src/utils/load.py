@@ -5,6 +5,7 @@ This module handles loading and parsing of configuration files from
 the config directory.
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict
 
@@ -28,3 +29,22 @@ def load_config(config_file: str) -> Dict[str, Any]:
     if not config_path.exists():
         raise FileNotFoundError(f"Configuration file {config_file} not found")
     return toml.load(config_path)
+
+
+@lru_cache(maxsize=None)
+def get_shared_config(config_file: str) -> Dict[str, Any]:
+    """
+    Get the process-wide copy of a configuration file.
+
+    The process bootstrap attaches these copies to every session and the
+    shared services read their settings from them, so a file is parsed once
+    and there is a single source of truth per process. Callers must treat
+    the result as read-only.
+
+    Args:
+        config_file (str): Name of the configuration file to load
+
+    Returns:
+        Dict[str, Any]: Parsed configuration data
+    """
+    return load_config(config_file)
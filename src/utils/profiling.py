@@ -0,0 +1,261 @@
+"""
+Per-rerun profiling utilities.
+
+This module provides an opt-in sampling profiler for script runs. When
+enabled in runtime.toml, or with the ?profile=1 query parameter where the
+configuration allows it, each run of a page is sampled from a background
+thread until the page script finishes, however it ends (including st.rerun
+and st.stop). Every run writes a folded stack file for flamegraph tools
+(flamegraph.pl, speedscope), a pstats file (python -m pstats, snakeviz) and
+logs the time attributed to our modules. Only the most recent runs are kept
+in the output directory. Fragment reruns do not run the page script, so
+fragments are profiled separately when they rerun on their own.
+"""
+
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("profiling")
+
+ROOT = Path(__file__).resolve().parents[2]
+
+FrameKey = Tuple[str, int, str]
+
+
+def get_profiling_config() -> Dict[str, Any]:
+    """Get the profiling settings from runtime.toml."""
+    return get_shared_config("runtime.toml").get("profiling", {})
+
+
+def component(filename: str) -> str:
+    """
+    Name the part of the application a source file belongs to.
+
+    Args:
+        filename (str): Code object filename
+
+    Returns:
+        str: Dotted module for our code (e.g. src.models.llm), "generated code"
+            for exec'd tools, or the top-level package of a dependency
+    """
+    if filename == "<string>":
+        return "generated code"
+    path = Path(filename)
+    try:
+        relative = path.resolve().relative_to(ROOT)
+    except ValueError:
+        relative = None
+    if relative is not None and ".venv" not in relative.parts:
+        return ".".join(relative.with_suffix("").parts)
+
+    parts = path.parts
+    if "site-packages" in parts:
+        index = parts.index("site-packages")
+        if index + 1 < len(parts):
+            return parts[index + 1].removesuffix(".py")
+    return "python"
+
+
+def is_own(name: str) -> bool:
+    """Whether a component is application code rather than a dependency."""
+    return name.startswith(("src.", "pages.")) or name in ("Home", "generated code")
+
+
+class RunProfiler:
+    """Sampling profiler for a single script run."""
+
+    def __init__(self, page: str, interval: float, output_dir: str, max_runs: int = 50):
+        self.page = page
+        self.interval = interval
+        self.output_dir = Path(output_dir)
+        self.max_runs = max_runs
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._root: Optional[FrameType] = None
+        self._started = 0.0
+
+    def start(self, root: FrameType) -> None:
+        """
+        Start sampling the calling thread until the root frame returns.
+
+        Args:
+            root (FrameType): Frame of the page script being profiled
+        """
+        self._root = root
+        self._started = time.perf_counter()
+        threading.Thread(
+            target=self._sample, name=f"profiler-{self.page}", daemon=True
+        ).start()
+
+    def _stack(self) -> Optional[Tuple[FrameKey, ...]]:
+        """Current stack of the profiled thread from the root frame, if running."""
+        frame = sys._current_frames().get(self._thread_id)
+        stack: List[FrameKey] = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            if frame is self._root:
+                return tuple(reversed(stack))
+            frame = frame.f_back
+        return None
+
+    def _sample(self) -> None:
+        """Sample the script thread until the page script has finished."""
+        try:
+            while True:
+                time.sleep(self.interval)
+                stack = self._stack()
+                if stack is None:
+                    break
+                self.samples[stack] += 1
+        finally:
+            self._root = None
+            self._write(time.perf_counter() - self._started)
+
+    def _write(self, duration: float) -> None:
+        """Write the folded stacks and pstats of the run and log attribution."""
+        total = sum(self.samples.values())
+        if not total:
+            return
+        seconds = duration / total
+        stem = f"{self.page}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.output_dir / f"{stem}.folded", "w") as f:
+                for stack, count in self.samples.items():
+                    frames = ";".join(
+                        f"{component(file)}:{name}" for file, _, name in stack
+                    )
+                    f.write(f"{frames} {count}\n")
+            with open(self.output_dir / f"{stem}.pstats", "wb") as f:
+                marshal.dump(self._pstats(seconds), f)
+        except Exception as e:
+            logger.error(f"Error writing profile for {self.page}: {e}")
+            return
+        self._rotate()
+
+        logger.info(
+            f"Profiled {self.page} run: {duration:.3f}s, {total} samples -> "
+            f"{self.output_dir / stem}.{{folded,pstats}}; "
+            + ", ".join(
+                f"{name} {share:.0%}" for name, share in self.attribution().items()
+            )
+        )
+
+    def _rotate(self) -> None:
+        """Delete the oldest profiles beyond the most recent max_runs runs."""
+        try:
+            runs = sorted(
+                self.output_dir.glob("*.folded"), key=lambda path: path.stat().st_mtime
+            )
+            for folded in runs[: max(len(runs) - self.max_runs, 0)]:
+                folded.unlink(missing_ok=True)
+                folded.with_suffix(".pstats").unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Error rotating profiles in {self.output_dir}: {e}")
+
+    def attribution(self) -> Dict[str, float]:
+        """
+        Share of the run spent in each of our modules and in dependencies.
+
+        Samples are attributed to the innermost frame from our own code, so
+        time in Streamlit or LangChain counts toward the module calling it.
+        Only samples entirely in dependencies are attributed to them.
+
+        Returns:
+            Dict[str, float]: Share of samples per component, largest first
+        """
+        total = sum(self.samples.values())
+        shares: Counter = Counter()
+        for stack, count in self.samples.items():
+            components = [component(file) for file, _, _ in stack]
+            ours = [name for name in components if is_own(name)]
+            shares[ours[-1] if ours else components[-1]] += count
+        return {name: count / total for name, count in shares.most_common()}
+
+    def _pstats(self, seconds: float) -> Dict:
+        """Build a pstats-compatible dict from the sampled stacks."""
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        edges: Counter = Counter()
+        edges_own: Counter = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            if len(stack) > 1:
+                edges_own[(stack[-2], stack[-1])] += count
+            for key in set(stack):
+                inclusive[key] += count
+            for edge in set(zip(stack, stack[1:], strict=False)):
+                edges[edge] += count
+
+        stats = {}
+        for key, count in inclusive.items():
+            callers = {
+                caller: (n, n, edges_own[(caller, callee)] * seconds, n * seconds)
+                for (caller, callee), n in edges.items()
+                if callee == key
+            }
+            stats[key] = (count, count, own[key] * seconds, count * seconds, callers)
+        return stats
+
+
+def profile_page(page: str) -> None:
+    """
+    Profile the current script run if profiling is enabled.
+
+    Call at the very top of a page. Profiling is enabled by `enabled = true`
+    in the [profiling] section of runtime.toml, or per session by the
+    ?profile=1 query parameter when `allow_query_param = true`; when disabled
+    this costs a dictionary lookup.
+
+    Args:
+        page (str): Name of the page used for the output files
+    """
+    _profile(page, sys._getframe(1))
+
+
+def profile_fragment(name: str) -> None:
+    """
+    Profile the current fragment rerun if profiling is enabled.
+
+    Call at the very top of a fragment. Only reruns of this fragment on its
+    own are profiled; in full runs, and when nested in another fragment being
+    rerun, it is covered by the enclosing profile.
+
+    Args:
+        name (str): Name of the page and fragment used for the output files,
+            e.g. travel_info_agent.chat_region
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or ctx.current_fragment_id not in (ctx.fragment_ids_this_run or []):
+        return
+    _profile(name, sys._getframe(1))
+
+
+def _profile(name: str, root: FrameType) -> None:
+    """Start profiling a frame if enabled in the config or by the query parameter."""
+    config = get_profiling_config()
+    if not config.get("enabled", False) and not (
+        config.get("allow_query_param", False) and st.query_params.get("profile") == "1"
+    ):
+        return
+
+    RunProfiler(
+        name,
+        interval=config.get("interval", 0.005),
+        output_dir=config.get("output_dir", "logs/profiles"),
+        max_runs=config.get("max_runs", 50),
+    ).start(root)
@@ -0,0 +1,619 @@
+"""
+Session state memory management utilities.
+
+This module tracks the approximate memory footprint of the heavy values each
+Streamlit session keeps in st.session_state (chat histories, agent checkpoints
+and generated code). Sessions idle beyond a threshold, or the least recently
+used sessions once a global memory budget is exceeded, have that state spilled
+to disk and released by a background reaper, never during one of their script
+runs. It is restored on demand when the session returns.
+When a shared state backend is configured, the same values are also synced to
+it, so that any replica can resume a copy of the session from a resume token.
+"""
+
+import atexit
+import hashlib
+import os
+import pickle
+import secrets
+import shutil
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Dict, MutableMapping, Optional
+
+import streamlit as st
+from langgraph.checkpoint.memory import InMemorySaver
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.utils.jobs import get_job_manager
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+from src.utils.state_backend import StateBackend, get_state_backend
+
+logger = setup_logger("session_state")
+
+# Session state keys holding unbounded, per-session data
+HEAVY_KEYS = ("checkpointer", "page_1_messages", "page_2_messages", "code_blocks")
+
+# Heavy keys that only ever grow by appending, merged as such on conflicts
+APPEND_KEYS = ("page_1_messages", "page_2_messages")
+
+
+def approximate_size(obj: Any) -> int:
+    """
+    Approximate the deep memory footprint of an object in bytes.
+
+    Args:
+        obj (Any): Object to measure
+
+    Returns:
+        int: Approximate size including referenced containers and attributes
+    """
+    seen = set()
+    pending = deque([obj])
+    total = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item, 0)
+
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            pending.extend(item)
+        elif hasattr(item, "__dict__"):
+            pending.append(vars(item))
+    return total
+
+
+def _dump_value(value: Any) -> Any:
+    """Convert a heavy value into a picklable snapshot."""
+    if isinstance(value, InMemorySaver):
+        # The saver's defaultdicts use lambdas, so snapshot them as plain dicts
+        return {
+            "storage": {
+                thread: {ns: dict(saves) for ns, saves in namespaces.items()}
+                for thread, namespaces in value.storage.items()
+            },
+            "writes": dict(value.writes),
+            "blobs": dict(value.blobs),
+        }
+    return value
+
+
+def _clear_value(value: Any) -> None:
+    """Release the contents of a heavy value in place."""
+    if isinstance(value, InMemorySaver):
+        value.storage.clear()
+        value.writes.clear()
+        value.blobs.clear()
+    elif isinstance(value, (list, dict)):
+        value.clear()
+
+
+def _restore_value(value: Any, snapshot: Any) -> Any:
+    """Restore a snapshot into the (cleared) heavy value, creating it if gone."""
+    if isinstance(value, InMemorySaver) or (
+        value is None and isinstance(snapshot, dict) and "storage" in snapshot
+    ):
+        value = value if value is not None else InMemorySaver()
+        for thread, namespaces in snapshot["storage"].items():
+            for ns, saves in namespaces.items():
+                value.storage[thread][ns].update(saves)
+        value.writes.update(snapshot["writes"])
+        value.blobs.update(snapshot["blobs"])
+    elif isinstance(value, list):
+        value.extend(snapshot)
+    elif isinstance(value, dict):
+        value.update(snapshot)
+    else:
+        value = snapshot
+    return value
+
+
+def _digest(snapshot: Any) -> int:
+    """Cheap fingerprint of a snapshot for detecting unsynced changes."""
+    return zlib.crc32(pickle.dumps(snapshot))
+
+
+def _merge_snapshots(remote: Any, local: Any, key: str, base_length: int) -> Any:
+    """
+    Merge local changes into the latest shared snapshot of a heavy value.
+
+    Args:
+        remote (Any): Latest snapshot in the state backend
+        local (Any): Local snapshot
+        key (str): Session state key of the value
+        base_length (int): Length of an append-only value at the last sync
+
+    Returns:
+        Any: Merged snapshot
+    """
+    if remote is None:
+        return local
+    if key in APPEND_KEYS:
+        return remote + local[base_length:]
+    if isinstance(local, dict) and "storage" in local:
+        # Checkpoint IDs are unique, so checkpoints from both sides are kept
+        merged = _dump_value(_restore_value(None, remote))
+        for thread, namespaces in local["storage"].items():
+            for ns, saves in namespaces.items():
+                merged["storage"].setdefault(thread, {}).setdefault(ns, {}).update(
+                    saves
+                )
+        merged["writes"].update(local["writes"])
+        merged["blobs"].update(local["blobs"])
+        return merged
+    # Whole values such as generated code blocks: last writer wins
+    return local
+
+
+def _replace_value(state: MutableMapping, key: str, snapshot: Any) -> None:
+    """Replace a heavy value in place with the contents of a snapshot."""
+    if key in state and state[key] is not None:
+        _clear_value(state[key])
+        state[key] = _restore_value(state[key], snapshot)
+    else:
+        state[key] = _restore_value(None, snapshot)
+
+
+@dataclass
+class SessionRecord:
+    """Book-keeping for a single session's heavy state."""
+
+    last_seen: float = field(default_factory=time.monotonic)
+    size: int = 0
+    measured_at: float = 0.0
+    values: Optional[Dict[str, Any]] = None
+    spill_path: Optional[Path] = None
+    # Script runner thread of the session's latest run, alive while it runs
+    run_thread: Optional[threading.Thread] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SessionStateManager:
+    """Process-wide accounting and eviction of heavy session state."""
+
+    def __init__(
+        self,
+        idle_timeout: float = 1800.0,
+        memory_budget_mb: float = 512.0,
+        measure_interval: float = 10.0,
+        sweep_interval: float = 30.0,
+        min_idle: float = 60.0,
+        spill_retention: float = 86400.0,
+        spill_dir: str = ".cache/sessions",
+    ):
+        self.idle_timeout = idle_timeout
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.measure_interval = measure_interval
+        self.sweep_interval = sweep_interval
+        self.min_idle = min_idle
+        self.spill_retention = spill_retention
+        # Replicas on the same host share the spill root, so each process
+        # spills into its own directory and only ever removes its own files
+        self.spill_dir = Path(spill_dir) / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._records: Dict[str, SessionRecord] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._metrics = {
+            "evictions": 0,
+            "budget_evictions": 0,
+            "restores": 0,
+            "spilled_bytes": 0,
+            "expired": 0,
+        }
+
+        # Owners remove their spill files within the retention, so older ones
+        # were left behind by processes that are gone
+        cutoff = time.time() - spill_retention
+        for stale in Path(spill_dir).glob("*/*.pkl"):
+            try:
+                if stale.stat().st_mtime < cutoff:
+                    stale.unlink(missing_ok=True)
+            except OSError:
+                pass
+        atexit.register(self.close)
+
+        # Sweeps run on their own thread, so their spill cost never lands on
+        # the script run of an unrelated session
+        threading.Thread(target=self._reap, name="session-reaper", daemon=True).start()
+
+    def close(self) -> None:
+        """Remove this process's spill files, which no other process can restore."""
+        self._stopped.set()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _reap(self) -> None:
+        """Sweep sessions every sweep_interval until closed."""
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Failed to sweep sessions: {str(e)}")
+
+    def touch(self, session_id: str, state: MutableMapping) -> None:
+        """
+        Mark a session as active, restoring its spilled state if needed.
+
+        Must be called from the session's own script thread.
+
+        Args:
+            session_id (str): Session to mark as active
+            state (MutableMapping): The session's st.session_state
+        """
+        with self._lock:
+            record = self._records.setdefault(session_id, SessionRecord())
+
+        with record.lock:
+            record.last_seen = time.monotonic()
+            if get_script_run_ctx(suppress_warning=True) is not None:
+                record.run_thread = threading.current_thread()
+            if record.spill_path is not None:
+                self._restore(session_id, record, state)
+
+            # Re-read the references, as pages may have reassigned the values
+            record.values = {key: state[key] for key in HEAVY_KEYS if key in state}
+            if record.last_seen - record.measured_at > self.measure_interval:
+                record.size = approximate_size(record.values)
+                record.measured_at = record.last_seen
+
+    def sweep(self, exclude: Optional[str] = None) -> None:
+        """
+        Evict idle sessions, then least recently used ones over the budget.
+
+        Sessions in the middle of a script run or with a running job are
+        skipped.
+
+        Args:
+            exclude (str, optional): Session that must not be evicted
+        """
+        now = time.monotonic()
+        before = dict(self._metrics)
+        with self._lock:
+            # Forget sessions that have not come back within the retention
+            for session_id, record in list(self._records.items()):
+                if record.spill_path and now - record.last_seen > self.spill_retention:
+                    record.spill_path.unlink(missing_ok=True)
+                    del self._records[session_id]
+                    self._metrics["expired"] += 1
+
+            candidates = sorted(
+                (
+                    (session_id, record)
+                    for session_id, record in self._records.items()
+                    if session_id != exclude and record.values is not None
+                ),
+                key=lambda item: item[1].last_seen,
+            )
+
+        for session_id, record in candidates:
+            if now - record.last_seen > self.idle_timeout:
+                self._evict(session_id, record)
+
+        for session_id, record in candidates:
+            if self.total_size() <= self.memory_budget:
+                break
+            if now - record.last_seen > self.min_idle and self._evict(
+                session_id, record
+            ):
+                self._metrics["budget_evictions"] += 1
+
+        if self._metrics != before:
+            logger.info(f"Session state metrics: {self.metrics()}")
+
+    def total_size(self) -> int:
+        """Approximate bytes held in memory across all tracked sessions."""
+        with self._lock:
+            return sum(
+                record.size
+                for record in self._records.values()
+                if record.values is not None
+            )
+
+    def metrics(self) -> Dict[str, int]:
+        """Eviction counters and current memory accounting."""
+        with self._lock:
+            sessions = len(self._records)
+            spilled = sum(1 for r in self._records.values() if r.spill_path)
+        return {
+            **self._metrics,
+            "sessions": sessions,
+            "spilled_sessions": spilled,
+            "resident_bytes": self.total_size(),
+        }
+
+    def _evict(self, session_id: str, record: SessionRecord) -> bool:
+        """Spill a session's heavy state to disk and release it."""
+        if get_job_manager().has_running(session_id):
+            return False
+
+        with record.lock:
+            if record.values is None:
+                return False
+            # Pages read and write the values throughout their runs
+            if record.run_thread is not None and record.run_thread.is_alive():
+                return False
+            try:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                spill_path = self.spill_dir / f"{session_id}.pkl"
+                payload = pickle.dumps(
+                    {key: _dump_value(value) for key, value in record.values.items()}
+                )
+                spill_path.write_bytes(payload)
+            except Exception as e:
+                logger.error(f"Failed to spill session {session_id}: {str(e)}")
+                return False
+
+            for value in record.values.values():
+                _clear_value(value)
+
+            logger.info(
+                f"Evicted session {session_id} ({record.size} bytes, "
+                f"idle {time.monotonic() - record.last_seen:.0f}s)"
+            )
+            self._metrics["evictions"] += 1
+            self._metrics["spilled_bytes"] += len(payload)
+            record.values = None
+            record.size = 0
+            record.spill_path = spill_path
+            return True
+
+    def _restore(
+        self, session_id: str, record: SessionRecord, state: MutableMapping
+    ) -> None:
+        """Load a session's spilled state back into its st.session_state."""
+        try:
+            snapshot = pickle.loads(record.spill_path.read_bytes())
+        except Exception as e:
+            logger.error(f"Failed to restore session {session_id}: {str(e)}")
+            snapshot = {}
+            # The values stay cleared, so mark them as unsynced and unchanged:
+            # the next refresh pulls them from the backend instead of the
+            # next persist overwriting the backend with the empty values
+            known = state.setdefault("state_versions", {})
+            for key in HEAVY_KEYS:
+                if key in state:
+                    known[key] = SessionStore._entry(_dump_value(state[key]), 0)
+            state["state_synced_at"] = 0.0
+
+        for key, value in snapshot.items():
+            state[key] = _restore_value(state[key] if key in state else None, value)
+
+        record.spill_path.unlink(missing_ok=True)
+        record.spill_path = None
+        record.measured_at = 0.0
+        self._metrics["restores"] += 1
+        logger.info(f"Restored session {session_id}")
+
+
+class SessionStore:
+    """Syncs heavy session state with a shared, versioned state backend."""
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        refresh_interval: float = 2.0,
+        retries: int = 5,
+        ttl: float = 604800.0,
+        purge_interval: float = 3600.0,
+    ):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+        self.retries = retries
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def refresh(self, session_id: str, state: MutableMapping) -> None:
+        """
+        Pull values written by other replicas into the session.
+
+        Local changes not yet persisted are kept on top of the pulled values.
+
+        Args:
+            session_id (str): Session to refresh
+            state (MutableMapping): The session's st.session_state
+        """
+        now = time.monotonic()
+        if (
+            "state_versions" in state
+            and now - state.get("state_synced_at", 0.0) < self.refresh_interval
+        ):
+            return
+        # Values must not be swapped out under a job that is writing them
+        if get_job_manager().has_running(session_id):
+            return
+
+        known = state.setdefault("state_versions", {})
+        state["state_synced_at"] = now
+        try:
+            versions = self.backend.versions(session_id)
+            for key, version in versions.items():
+                entry = known.get(key, {})
+                if key not in HEAVY_KEYS or version <= entry.get("version", 0):
+                    continue
+
+                remote, version = self.backend.get(session_id, key)
+                merged = remote
+                if key in state:
+                    local = _dump_value(state[key])
+                    if _digest(local) != entry.get("digest"):
+                        merged = _merge_snapshots(
+                            remote, local, key, entry.get("length", 0)
+                        )
+                _replace_value(state, key, merged)
+                known[key] = self._entry(remote, version)
+                logger.info(f"Pulled {key} v{version} for session {session_id}")
+        except Exception as e:
+            logger.error(f"Failed to refresh session {session_id}: {str(e)}")
+
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            removed = self.backend.purge(self.ttl)
+            if removed:
+                logger.info(f"Purged {removed} expired state entries")
+
+    def persist(self, session_id: str, state: MutableMapping) -> None:
+        """
+        Push the session's changed heavy values to the backend.
+
+        Conflicting writes from other replicas are merged and retried.
+
+        Args:
+            session_id (str): Session to persist
+            state (MutableMapping): The session's st.session_state
+        """
+        known = state.setdefault("state_versions", {})
+        for key in HEAVY_KEYS:
+            if key not in state:
+                continue
+            local = _dump_value(state[key])
+            entry = known.get(key, {})
+            if _digest(local) == entry.get("digest"):
+                continue
+
+            try:
+                value, version = self.backend.update(
+                    session_id,
+                    key,
+                    partial(
+                        _merge_snapshots,
+                        local=local,
+                        key=key,
+                        base_length=entry.get("length", 0),
+                    ),
+                    expected_version=entry.get("version", 0),
+                    value=local,
+                    retries=self.retries,
+                )
+            except Exception as e:
+                logger.error(f"Failed to persist {key} for {session_id}: {str(e)}")
+                continue
+
+            if value is not local:
+                _replace_value(state, key, value)
+            known[key] = self._entry(value, version)
+
+    def issue_token(self, session_id: str) -> str:
+        """
+        Create a resume token for a session.
+
+        The token is a random secret, not the session ID, and only grants
+        a copy of the session's state through resume.
+
+        Args:
+            session_id (str): Session the token resumes
+
+        Returns:
+            str: Token to put in the session's URL
+        """
+        token = secrets.token_urlsafe(24)
+        self.backend.put(self._token_namespace(token), "session", session_id, 0)
+        return token
+
+    def resume(self, token: str, state: MutableMapping) -> bool:
+        """
+        Copy the state of the session a token was issued for into a new session.
+
+        The new session keeps its own ID, so a duplicated tab or a second
+        visitor with the same link never shares jobs or state with the
+        original session. Other values stored under the session, such as
+        conversation summaries, are copied to the new session's namespace.
+
+        Args:
+            token (str): Resume token from the URL
+            state (MutableMapping): The new session's st.session_state
+
+        Returns:
+            bool: Whether the token was valid and state was copied
+        """
+        try:
+            source, _ = self.backend.get(self._token_namespace(token), "session")
+            if source is None:
+                return False
+            for key in self.backend.versions(source):
+                value, _ = self.backend.get(source, key)
+                if value is None:
+                    continue
+                if key in HEAVY_KEYS:
+                    _replace_value(state, key, value)
+                else:
+                    self.backend.put(state["session_id"], key, value, 0)
+        except Exception as e:
+            logger.error(f"Failed to resume session: {str(e)}")
+            return False
+
+        # Written to the new session's namespace by the next persist
+        state["state_versions"] = {}
+        logger.info(f"Resumed session {source} as {state['session_id']}")
+        return True
+
+    @staticmethod
+    def _token_namespace(token: str) -> str:
+        """Backend namespace of a resume token, which never stores the token."""
+        return "resume:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _entry(snapshot: Any, version: int) -> Dict[str, int]:
+        """Sync book-keeping for a snapshot stored at a version."""
+        return {
+            "version": version,
+            "length": len(snapshot) if isinstance(snapshot, list) else 0,
+            "digest": _digest(snapshot),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_session_manager() -> SessionStateManager:
+    """Get the process-wide session state manager configured from runtime.toml."""
+    config = get_shared_config("runtime.toml").get("session_state", {})
+    return SessionStateManager(
+        idle_timeout=config.get("idle_timeout", 1800.0),
+        memory_budget_mb=config.get("memory_budget_mb", 512.0),
+        measure_interval=config.get("measure_interval", 10.0),
+        sweep_interval=config.get("sweep_interval", 30.0),
+        min_idle=config.get("min_idle", 60.0),
+        spill_retention=config.get("spill_retention", 86400.0),
+        spill_dir=config.get("spill_dir", ".cache/sessions"),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> Optional[SessionStore]:
+    """Get the process-wide session store, if a state backend is configured."""
+    backend = get_state_backend()
+    if backend is None:
+        return None
+    config = get_shared_config("runtime.toml").get("state_backend", {})
+    return SessionStore(
+        backend,
+        refresh_interval=config.get("refresh_interval", 2.0),
+        retries=config.get("retries", 5),
+        ttl=config.get("ttl", 604800.0),
+    )
+
+
+def track_session() -> None:
+    """Mark the current session as active, restoring evicted or shared state."""
+    get_session_manager().touch(st.session_state.session_id, st.session_state)
+    if store := get_session_store():
+        store.refresh(st.session_state.session_id, st.session_state)
+
+
+def persist_session() -> None:
+    """Push the current session's changed state to the shared backend, if any."""
+    if store := get_session_store():
+        store.persist(st.session_state.session_id, st.session_state)
@@ -0,0 +1,338 @@
+"""
+Shared state backends for session data.
+
+This module provides versioned key-value stores that hold session data outside
+the Streamlit process, so that any replica can serve any session and state
+survives restarts. Writes use optimistic concurrency: every value carries a
+version and a write only succeeds against the version it was based on.
+Values are stored as tagged JSON, so reading a store never runs code.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from src.utils.load import get_shared_config
+from src.utils.logger import setup_logger
+
+logger = setup_logger("state_backend")
+
+
+class VersionConflictError(Exception):
+    """Raised when a value changed since the version a write was based on."""
+
+
+def _tag(value: Any) -> Any:
+    """Convert a value to JSON-compatible data, tagging non-JSON types."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_tag(item) for item in value]}
+    if isinstance(value, list):
+        return [_tag(item) for item in value]
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and not (
+            len(value) == 1 and next(iter(value)).startswith("__")
+        ):
+            return {key: _tag(item) for key, item in value.items()}
+        return {"__items__": [[_tag(k), _tag(v)] for k, v in value.items()]}
+    if isinstance(value, BaseMessage):
+        # Agent stream chunks kept in the chat history hold LangChain messages
+        return {"__message__": _tag(message_to_dict(value))}
+    raise TypeError(f"Cannot store values of type {type(value).__name__}")
+
+
+def _untag(data: Any) -> Any:
+    """Rebuild a value from the data produced by _tag."""
+    if isinstance(data, list):
+        return [_untag(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "__bytes__" in data:
+        return base64.b64decode(data["__bytes__"])
+    if "__tuple__" in data:
+        return tuple(_untag(item) for item in data["__tuple__"])
+    if "__items__" in data:
+        return {_untag(k): _untag(v) for k, v in data["__items__"]}
+    if "__message__" in data:
+        return messages_from_dict([_untag(data["__message__"])])[0]
+    return {key: _untag(item) for key, item in data.items()}
+
+
+def encode(value: Any) -> bytes:
+    """
+    Serialize a value for storage.
+
+    Only plain data is supported: None, str, int, float, bool, bytes,
+    LangChain messages, and lists, tuples and dicts of those (dict keys may
+    be any of them).
+
+    Args:
+        value (Any): Value to serialize
+
+    Returns:
+        bytes: UTF-8 encoded, tagged JSON
+
+    Raises:
+        TypeError: If the value holds an unsupported type
+    """
+    return json.dumps(_tag(value), separators=(",", ":")).encode("utf-8")
+
+
+def decode(payload: bytes) -> Any:
+    """Deserialize a value written by encode."""
+    return _untag(json.loads(payload))
+
+
+class StateBackend(ABC):
+    """Interface of a versioned key-value store grouped by namespace."""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Tuple[Any, int]:
+        """
+        Read a value and its version.
+
+        Args:
+            namespace (str): Group of keys, e.g. a session ID
+            key (str): Key within the namespace
+
+        Returns:
+            Tuple[Any, int]: The value (None if missing) and its version (0)
+        """
+
+    @abstractmethod
+    def versions(self, namespace: str) -> Dict[str, int]:
+        """Current version of every key in a namespace, in one round trip."""
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Any, expected_version: int) -> int:
+        """
+        Write a value if its version is still the expected one.
+
+        Args:
+            namespace (str): Group of keys, e.g. a session ID
+            key (str): Key within the namespace
+            value (Any): Plain data value to store (see encode)
+            expected_version (int): Version the write is based on (0 if new)
+
+        Returns:
+            int: The new version
+
+        Raises:
+            VersionConflictError: If another writer got there first
+        """
+
+    @abstractmethod
+    def purge(self, max_age: float) -> int:
+        """Delete namespaces not written for max_age seconds; return entries removed."""
+
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        merge: Callable[[Any], Any],
+        expected_version: int,
+        value: Any,
+        retries: int = 5,
+    ) -> Tuple[Any, int]:
+        """
+        Write a value, merging with concurrent writes on version conflicts.
+
+        Args:
+            namespace (str): Group of keys, e.g. a session ID
+            key (str): Key within the namespace
+            merge (Callable[[Any], Any]): Combines the latest stored value
+                with the local changes after a conflict
+            expected_version (int): Version the local value is based on
+            value (Any): Local value to write
+            retries (int): Conflicts tolerated before giving up
+
+        Returns:
+            Tuple[Any, int]: The value written and its version
+        """
+        for attempt in range(retries + 1):
+            try:
+                return value, self.put(namespace, key, value, expected_version)
+            except VersionConflictError:
+                if attempt == retries:
+                    raise
+                remote, expected_version = self.get(namespace, key)
+                value = merge(remote)
+                logger.info(
+                    f"Version conflict on {namespace}/{key}, retrying at "
+                    f"version {expected_version}"
+                )
+
+
+class SQLiteStateBackend(StateBackend):
+    """State backend in a local SQLite file shared by replicas on one host."""
+
+    def __init__(self, path: str = ".cache/state.db", timeout: float = 5.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    value BLOB NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection, as sqlite3 connections are not thread-safe."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, int]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value, version FROM state WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            .fetchone()
+        )
+        return (decode(row[0]), row[1]) if row else (None, 0)
+
+    def versions(self, namespace: str) -> Dict[str, int]:
+        rows = (
+            self._connect()
+            .execute("SELECT key, version FROM state WHERE namespace = ?", (namespace,))
+            .fetchall()
+        )
+        return dict(rows)
+
+    def put(self, namespace: str, key: str, value: Any, expected_version: int) -> int:
+        payload = encode(value)
+        with self._connect() as connection:
+            if expected_version == 0:
+                try:
+                    connection.execute(
+                        "INSERT INTO state VALUES (?, ?, 1, ?, ?)",
+                        (namespace, key, payload, time.time()),
+                    )
+                except sqlite3.IntegrityError:
+                    raise VersionConflictError(
+                        f"{namespace}/{key} already exists"
+                    ) from None
+                return 1
+
+            cursor = connection.execute(
+                "UPDATE state SET value = ?, version = version + 1, updated_at = ? "
+                "WHERE namespace = ? AND key = ? AND version = ?",
+                (payload, time.time(), namespace, key, expected_version),
+            )
+            if cursor.rowcount == 0:
+                raise VersionConflictError(
+                    f"{namespace}/{key} changed since version {expected_version}"
+                )
+            return expected_version + 1
+
+    def purge(self, max_age: float) -> int:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "DELETE FROM state WHERE namespace IN ("
+                "SELECT namespace FROM state GROUP BY namespace "
+                "HAVING MAX(updated_at) < ?)",
+                (time.time() - max_age,),
+            )
+            return cursor.rowcount
+
+
+class InMemoryKVBackend(StateBackend):
+    """
+    Stand-in for a network key-value store (e.g. Redis or etcd).
+
+    Values are serialized on every call and each call waits for a simulated
+    round trip, so behaviour and costs match a remote store without one.
+    """
+
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+        self._data: Dict[Tuple[str, str], Tuple[bytes, int, float]] = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, int]:
+        self._round_trip()
+        with self._lock:
+            entry = self._data.get((namespace, key))
+        return (decode(entry[0]), entry[1]) if entry else (None, 0)
+
+    def versions(self, namespace: str) -> Dict[str, int]:
+        self._round_trip()
+        with self._lock:
+            return {
+                key: entry[1]
+                for (ns, key), entry in self._data.items()
+                if ns == namespace
+            }
+
+    def put(self, namespace: str, key: str, value: Any, expected_version: int) -> int:
+        payload = encode(value)
+        self._round_trip()
+        with self._lock:
+            current = self._data.get((namespace, key))
+            version = current[1] if current else 0
+            if version != expected_version:
+                raise VersionConflictError(
+                    f"{namespace}/{key} is at version {version}, "
+                    f"expected {expected_version}"
+                )
+            self._data[(namespace, key)] = (payload, version + 1, time.time())
+            return version + 1
+
+    def purge(self, max_age: float) -> int:
+        self._round_trip()
+        cutoff = time.time() - max_age
+        with self._lock:
+            latest: Dict[str, float] = {}
+            for (namespace, _), entry in self._data.items():
+                latest[namespace] = max(latest.get(namespace, 0.0), entry[2])
+            expired = [
+                (namespace, key)
+                for namespace, key in self._data
+                if latest[namespace] < cutoff
+            ]
+            for entry in expired:
+                del self._data[entry]
+            return len(expired)
+
+
+@lru_cache(maxsize=1)
+def get_state_backend() -> Optional[StateBackend]:
+    """Get the process-wide state backend configured in runtime.toml, if any."""
+    config = get_shared_config("runtime.toml").get("state_backend", {})
+    backend = config.get("backend", "none")
+    if backend == "sqlite":
+        return SQLiteStateBackend(path=config.get("path", ".cache/state.db"))
+    if backend == "kv":
+        return InMemoryKVBackend(latency=config.get("kv_latency", 0.002))
+    if backend != "none":
+        logger.error(f"Unknown state backend: {backend}")
+    return None
@@ -0,0 +1,50 @@
+"""
+Incremental parsing utilities for streamed model output.
+
+This module extracts tagged blocks (e.g. <execute_python>...</execute_python>)
+from text that arrives in chunks, emitting each block as soon as its closing
+tag has been received instead of waiting for the full response.
+"""
+
+from typing import List
+
+
+class TagStreamParser:
+    """Incremental extractor for the contents of a given tag."""
+
+    def __init__(self, tag: str):
+        self.open_tag = f"<{tag}>"
+        self.close_tag = f"</{tag}>"
+        self._buffer = ""
+        self._inside = False
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Consume a chunk of text and return the blocks it completed.
+
+        Args:
+            text (str): Next chunk of streamed text
+
+        Returns:
+            List[str]: Contents of every block closed by this chunk
+        """
+        self._buffer += text
+        blocks = []
+        while True:
+            if not self._inside:
+                start = self._buffer.find(self.open_tag)
+                if start == -1:
+                    # Keep a tail that may be the start of a split opening tag
+                    keep = len(self.open_tag) - 1
+                    self._buffer = self._buffer[-keep:]
+                    break
+                self._buffer = self._buffer[start + len(self.open_tag) :]
+                self._inside = True
+
+            end = self._buffer.find(self.close_tag)
+            if end == -1:
+                break
+            blocks.append(self._buffer[:end])
+            self._buffer = self._buffer[end + len(self.close_tag) :]
+            self._inside = False
+        return blocks
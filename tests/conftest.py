@@ -0,0 +1,49 @@
+"""
+Shared pytest fixtures.
+
+Provider and search calls are served from cassettes in tests/cassettes. Set
+CASSETTE_MODE=record (with real API keys) to capture them once, and
+CASSETTE_LATENCY to replay them at a multiple of their recorded pace.
+
+The checked-in Groq (httpx) and Tavily (requests) cassettes are synthetic:
+they were recorded against stand-in responses in the providers' formats, so
+they hold no real traffic or credentials. Tests without a cassette, such as
+the Gemini one, are skipped.
+"""
+
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from src.utils.cassette import cassette_from_env
+
+CASSETTE_DIR = Path(__file__).parent / "cassettes"
+
+# Clients refuse to start without keys, even though replay never sends them
+PLACEHOLDER_KEYS = (
+    "GROQ_API_KEY",
+    "GOOGLE_API_KEY",
+    "ANTHROPIC_API_KEY",
+    "OPENAI_API_KEY",
+    "TAVILY_API_KEY",
+)
+
+
+@pytest.fixture
+def cassette(request, monkeypatch):
+    """Record or replay the HTTP traffic of a test, one cassette per test."""
+    name = re.sub(r"[^A-Za-z0-9]+", "_", request.node.name).strip("_")[:80]
+    path = CASSETTE_DIR / f"{request.module.__name__.split('.')[-1]}_{name}.json"
+    recorder = cassette_from_env(str(path))
+
+    if recorder.mode == "replay":
+        if not path.exists():
+            pytest.skip(f"No cassette recorded at {path}")
+        for key in PLACEHOLDER_KEYS:
+            if not os.environ.get(key):
+                monkeypatch.setenv(key, "replay")
+
+    with recorder:
+        yield recorder
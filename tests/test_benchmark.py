@@ -0,0 +1,91 @@
+"""
+Unit tests for model benchmarking.
+
+These tests cover stream measurements, token counting from provider usage or
+estimates, failed runs and the aggregated benchmark history.
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.models.benchmark import BenchmarkHistory, RunMetrics, measure_stream
+
+
+async def _stream(chunks, delay=0.02, fail=False):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+    if fail:
+        raise RuntimeError("rate limited")
+
+
+async def _drain(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_measures_ttft_latency_and_usage(tmp_path):
+    """Test that timings and provider-reported usage are captured and saved."""
+    history = BenchmarkHistory(path=str(tmp_path / "history.jsonl"))
+    metrics = RunMetrics(provider="groq", model="fast")
+    chunks = [
+        AIMessageChunk(content="Short "),
+        AIMessageChunk(
+            content="summary.",
+            usage_metadata={"input_tokens": 12, "output_tokens": 4, "total_tokens": 16},
+        ),
+    ]
+
+    assert asyncio.run(_drain(measure_stream(_stream(chunks), metrics, history))) == (
+        chunks
+    )
+    assert metrics.status == "done"
+    assert 0.02 <= metrics.ttft < metrics.latency
+    assert (metrics.input_tokens, metrics.output_tokens) == (12, 4)
+    assert not metrics.estimated_tokens
+    assert metrics.tokens_per_second > 0
+    assert history.load()[0]["model"] == "fast"
+
+
+def test_failed_run_is_recorded_with_estimated_tokens(tmp_path):
+    """Test that failures are recorded and missing usage is estimated."""
+    history = BenchmarkHistory(path=str(tmp_path / "history.jsonl"))
+    metrics = RunMetrics(provider="groq", model="flaky", prompt_chars=80)
+    stream = _stream([AIMessageChunk(content="x" * 40)], fail=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_drain(measure_stream(stream, metrics, history)))
+    assert metrics.status == "failed"
+    assert metrics.error == "rate limited"
+    assert metrics.estimated_tokens and metrics.output_tokens == 10
+    assert metrics.input_tokens == 20
+    assert history.load()[0]["status"] == "failed"
+
+
+def test_summary_ranks_pairs_by_median_latency(tmp_path):
+    """Test that the history is aggregated per pair, fastest first."""
+    history = BenchmarkHistory(path=str(tmp_path / "history.jsonl"))
+    for model, latency, status in [
+        ("slow", 3.0, "done"),
+        ("fast", 1.0, "done"),
+        ("fast", 2.0, "done"),
+        ("fast", 9.0, "failed"),
+    ]:
+        history.record(
+            RunMetrics(
+                provider="groq",
+                model=model,
+                status=status,
+                ttft=0.5,
+                latency=latency,
+                output_tokens=10,
+            )
+        )
+
+    summary = history.summary()
+    assert list(summary["model"]) == ["fast", "slow"]
+    fast = summary.iloc[0]
+    assert fast["runs"] == 3
+    assert fast["success_rate"] == pytest.approx(2 / 3)
+    assert fast["median_latency"] == 1.5
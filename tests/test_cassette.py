@@ -0,0 +1,127 @@
+"""
+Unit tests for HTTP record/replay cassettes.
+
+These tests record traffic from in-process httpx and requests transports and
+replay it with the transports disabled, covering streaming, credential
+scrubbing and latency simulation.
+"""
+
+import asyncio
+import io
+import json
+import time
+
+import httpx
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from src.utils.cassette import Cassette, CassetteError, timing_profile
+
+
+def slow_handler(request):
+    """Serve a streamed response whose chunks arrive 50 ms apart."""
+
+    def chunks():
+        for word in (b"data: one\n\n", b"data: two\n\n"):
+            time.sleep(0.05)
+            yield word
+
+    return httpx.Response(200, content=chunks(), headers={"content-type": "text/plain"})
+
+
+def failing_handler(request):
+    """Fail any request that reaches the network during replay."""
+    raise AssertionError("replay must not reach the transport")
+
+
+class EchoAdapter(BaseAdapter):
+    """requests adapter answering with a fixed JSON body."""
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["content-type"] = "application/json"
+        response.raw = io.BytesIO(b'{"results": [1, 2]}')
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_httpx_record_and_replay(tmp_path):
+    """Streamed httpx responses replay chunk by chunk without the network"""
+    path = tmp_path / "httpx.json"
+    with Cassette(str(path), mode="record"):
+        with httpx.Client(transport=httpx.MockTransport(slow_handler)) as client:
+            recorded = client.post("https://api.example.com/chat", json={"q": 1}).text
+
+    with Cassette(str(path), mode="replay"):
+        with httpx.Client(transport=httpx.MockTransport(failing_handler)) as client:
+            with client.stream(
+                "POST", "https://api.example.com/chat", json={"q": 1}
+            ) as response:
+                chunks = list(response.iter_text())
+
+    assert "".join(chunks) == recorded == "data: one\n\ndata: two\n\n"
+    assert len(chunks) == 2
+
+
+def test_async_replay_with_latency(tmp_path):
+    """Async replay reproduces the recorded latency when asked to"""
+    path = tmp_path / "async.json"
+    with Cassette(str(path), mode="record"):
+        with httpx.Client(transport=httpx.MockTransport(slow_handler)) as client:
+            client.get("https://api.example.com/models")
+
+    async def fetch():
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(failing_handler)
+        ) as client:
+            return (await client.get("https://api.example.com/models")).text
+
+    with Cassette(str(path), mode="replay", latency_scale=0.0):
+        started = time.perf_counter()
+        asyncio.run(fetch())
+        fast = time.perf_counter() - started
+
+    with Cassette(str(path), mode="replay", latency_scale=1.0):
+        started = time.perf_counter()
+        text = asyncio.run(fetch())
+        paced = time.perf_counter() - started
+
+    assert text == "data: one\n\ndata: two\n\n"
+    assert fast < 0.05 <= paced
+    assert timing_profile(str(path))["requests"] == 1
+
+
+def test_requests_scrubs_credentials(tmp_path):
+    """requests traffic is replayed and API keys never reach the cassette"""
+    path = tmp_path / "requests.json"
+    session = requests.Session()
+    session.mount("https://", EchoAdapter())
+    with Cassette(str(path), mode="record"):
+        session.post(
+            "https://api.tavily.com/search?key=secret",
+            json={"api_key": "secret", "query": "Kyoto"},
+        )
+
+    assert "secret" not in path.read_text()
+
+    with Cassette(str(path), mode="replay"):
+        response = requests.post(
+            "https://api.tavily.com/search?key=other",
+            json={"api_key": "other", "query": "Kyoto"},
+        )
+    assert response.json() == {"results": [1, 2]}
+    assert json.loads(path.read_text())["version"] == 1
+
+
+def test_unmatched_request_raises(tmp_path):
+    """Requests missing from the cassette fail instead of going live"""
+    path = tmp_path / "empty.json"
+    path.write_text(json.dumps({"version": 1, "interactions": []}))
+    with Cassette(str(path), mode="replay"):
+        with pytest.raises(CassetteError):
+            httpx.get("https://api.example.com/unknown")
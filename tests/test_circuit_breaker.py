@@ -0,0 +1,223 @@
+"""
+Unit tests for the per-provider circuit breakers.
+
+These tests cover opening after consecutive failures and latency outliers,
+half-open probing, the agent middleware and failover of basic LLM calls to
+the fallback model.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.models import llm as llm_module
+from src.models.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakerMiddleware,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    is_provider_failure,
+)
+
+
+class FakeModel:
+    """Chat model stand-in that streams a reply or fails."""
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    def _get_ls_params(self):
+        return {"ls_provider": "fake", "ls_model_name": self.name}
+
+    def stream(self, prompt):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        yield AIMessageChunk(content=self.name)
+
+    async def astream(self, prompt):
+        for chunk in self.stream(prompt):
+            yield chunk
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Fresh registry used by the LLM service instead of the process one."""
+    registry = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=0.1)
+    monkeypatch.setattr(llm_module, "get_circuit_breakers", lambda: registry)
+    return registry
+
+
+def fail(breaker, times):
+    """Record failed calls on a breaker."""
+    for _ in range(times):
+        breaker.acquire()
+        breaker.record_failure(ConnectionError("down"))
+
+
+def test_opens_after_consecutive_failures():
+    """Test that the circuit opens at the threshold and then fails fast."""
+    breaker = CircuitBreaker("fake:model", failure_threshold=3)
+    fail(breaker, 2)
+    breaker.acquire()
+    breaker.record_success(0.1)
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    started = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    assert time.perf_counter() - started < 0.01
+    assert breaker.metrics()["rejected"] == 1
+
+
+def test_half_open_probe_closes_circuit():
+    """Test that one probe is admitted after the cool-down and closes it."""
+    breaker = CircuitBreaker("fake:model", failure_threshold=1, reset_timeout=0.05)
+    fail(breaker, 1)
+    time.sleep(0.06)
+
+    breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_circuit():
+    """Test that a failing probe opens the circuit for another cool-down."""
+    breaker = CircuitBreaker("fake:model", failure_threshold=1, reset_timeout=0.05)
+    fail(breaker, 1)
+    time.sleep(0.06)
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert breaker.metrics()["opened"] == 2
+
+
+def test_latency_outliers_count_as_failures():
+    """Test that calls far slower than the recent median count as failures."""
+    breaker = CircuitBreaker(
+        "fake:model", failure_threshold=2, outlier_factor=4, min_samples=3
+    )
+    for _ in range(3):
+        breaker.acquire()
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_success(1.0)
+    assert breaker.state == OPEN
+    assert breaker.metrics()["slow_calls"] == 2
+
+
+class ProviderError(Exception):
+    """Provider SDK error carrying an HTTP status code."""
+
+    def __init__(self, status_code):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+def test_only_provider_failures_count():
+    """Test that timeouts, connection errors, 5xx and 429 are the only failures."""
+    assert is_provider_failure(TimeoutError("timed out"))
+    assert is_provider_failure(ConnectionError("refused"))
+    assert is_provider_failure(ProviderError(503))
+    assert is_provider_failure(ProviderError(429))
+    assert not is_provider_failure(ProviderError(400))
+    assert not is_provider_failure(ValueError("context length exceeded"))
+
+    breaker = CircuitBreaker("fake:model", failure_threshold=1)
+    breaker.acquire()
+    breaker.record_failure(ProviderError(400))
+    assert breaker.state == CLOSED
+    assert breaker.metrics()["client_errors"] == 1
+
+
+def test_request_errors_close_half_open_circuit():
+    """Test that a probe rejected for its request still closes the circuit."""
+    breaker = CircuitBreaker("fake:model", failure_threshold=1, reset_timeout=0.05)
+    fail(breaker, 1)
+    time.sleep(0.06)
+
+    breaker.acquire()
+    breaker.record_failure(ProviderError(400))
+    assert breaker.state == CLOSED
+
+
+def test_middleware_records_and_rejects(registry):
+    """Test that the agent middleware records failures and then fails fast."""
+    middleware = CircuitBreakerMiddleware(registry)
+    request = SimpleNamespace(model=FakeModel("primary"))
+    handler_calls = []
+
+    def handler(request):
+        handler_calls.append(request)
+        raise TimeoutError("timed out")
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            middleware.wrap_model_call(request, handler)
+    with pytest.raises(CircuitOpenError):
+        middleware.wrap_model_call(request, handler)
+    assert len(handler_calls) == 2
+    assert registry.get("fake", "primary").state == OPEN
+
+
+def test_stream_fails_over_to_fallback(registry):
+    """Test that a failing model is skipped for the fallback, then not called."""
+    service = llm_module.create_llm_service(
+        provider="fake", model="primary", fallback_model="fake:fallback"
+    )
+    primary, fallback = FakeModel("primary", fail=True), FakeModel("fallback")
+    service._llm, service._fallback = primary, fallback
+
+    for _ in range(3):
+        chunks = list(service.get_llm_stream("hi"))
+        assert [chunk.content for chunk in chunks] == ["fallback"]
+    assert primary.calls == 2
+    assert registry.get("fake", "primary").state == OPEN
+
+
+def test_async_stream_fails_fast_without_fallback(registry):
+    """Test that an open circuit without fallback fails the stream fast."""
+    service = llm_module.create_llm_service(provider="fake", model="primary")
+    primary = FakeModel("primary", fail=True)
+    service._llm = primary
+
+    async def consume():
+        return [chunk async for chunk in service.aget_llm_stream("hi")]
+
+    for error in (ConnectionError, ConnectionError, CircuitOpenError):
+        with pytest.raises(error):
+            asyncio.run(consume())
+    assert primary.calls == 2
+
+
+def test_middleware_ignores_completion_time(registry):
+    """Test that long agent completions are not counted as slow calls."""
+    registry.settings.update(outlier_factor=4, min_samples=1, slow_call_threshold=0.01)
+    middleware = CircuitBreakerMiddleware(registry)
+    request = SimpleNamespace(model=FakeModel("primary"))
+    breaker = registry.get("fake", "primary")
+    breaker.acquire()
+    breaker.record_success(0.001)
+
+    def handler(request):
+        time.sleep(0.02)
+        return "final answer"
+
+    for _ in range(3):
+        assert middleware.wrap_model_call(request, handler) == "final answer"
+    assert breaker.state == CLOSED
+    assert breaker.metrics()["slow_calls"] == 0
@@ -0,0 +1,62 @@
+"""
+Unit tests for web search result compaction.
+
+These tests cover boilerplate stripping, cross-result de-duplication, query
+ranking and the token budget.
+"""
+
+from src.tools.compaction import compact_results, estimate_tokens, split_sentences
+
+PAYLOAD = {
+    "query": "best time to visit Kyoto",
+    "results": [
+        {
+            "title": "Kyoto guide",
+            "url": "https://example.com/kyoto",
+            "score": 0.9,
+            "content": (
+                "The best time to visit Kyoto is spring and autumn. "
+                "Accept all cookies to continue browsing. "
+                "Kyoto has more than a thousand temples and shrines."
+            ),
+        },
+        {
+            "title": "Japan travel",
+            "url": "https://example.com/japan",
+            "score": 0.7,
+            "content": (
+                "The best time to visit Kyoto is spring and autumn! "
+                "Summers in Kyoto are hot and humid with frequent rain. "
+                "© 2025 Example Travel. All rights reserved."
+            ),
+        },
+    ],
+}
+
+
+def test_split_sentences_strips_boilerplate():
+    """Test that page chrome is dropped from the sentences."""
+    sentences = split_sentences(PAYLOAD["results"][0]["content"])
+    assert not any("cookies" in sentence for sentence in sentences)
+    assert len(sentences) == 2
+
+
+def test_compaction_deduplicates_across_results():
+    """Test that a sentence repeated by several sources is kept once."""
+    compacted = compact_results(PAYLOAD, PAYLOAD["query"])
+    assert compacted.count("best time to visit Kyoto") == 1
+    assert "All rights reserved" not in compacted
+
+
+def test_compaction_respects_token_budget_and_ranking():
+    """Test that the most relevant sentence survives a tight budget."""
+    compacted = compact_results(PAYLOAD, PAYLOAD["query"], token_budget=30)
+    assert estimate_tokens(compacted) <= 30
+    assert "spring and autumn" in compacted
+    assert "Summers" not in compacted
+
+
+def test_error_payloads_pass_through():
+    """Test that a failed search is not reported as an empty one."""
+    payload = {"error": "Unauthorized: missing or invalid API key."}
+    assert compact_results(payload, "kyoto") == str(payload)
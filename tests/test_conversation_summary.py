@@ -0,0 +1,228 @@
+"""
+Unit tests for background conversation summarization.
+
+These tests cover per-message token count caching, summaries computed after
+a turn and applied to the next one, incremental updates from only the new
+messages, stale summaries being ignored and summaries shared through the
+state backend.
+"""
+
+import asyncio
+import time
+
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.models import conversation_summary
+from src.models.conversation_summary import (
+    SUMMARY_PREFIX,
+    BackgroundSummarizationMiddleware,
+    Summary,
+    SummaryStore,
+    TokenCounter,
+    covered_prefix,
+)
+from src.utils.state_backend import InMemoryKVBackend
+
+
+class RecordingModel(GenericFakeChatModel):
+    """Fake chat model recording the messages of every call."""
+
+    calls: list = []
+
+    def _generate(self, messages, *args, **kwargs):
+        self.calls.append(list(messages))
+        return super()._generate(messages, *args, **kwargs)
+
+
+class FakeSummarizer:
+    """Summary model stand-in recording its prompts."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content=f"summary {len(self.prompts)}")
+
+
+def make_middleware(store):
+    """Middleware with a fake summary model and a tiny token budget."""
+    middleware = BackgroundSummarizationMiddleware(
+        model=FakeSummarizer(),
+        max_tokens_before_summary=10,
+        messages_to_keep=2,
+        session_id="session",
+        store=store,
+    )
+    return middleware
+
+
+def wait_for(condition, timeout=2.0):
+    """Wait for a background update to land."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_token_counts_cached_per_message(monkeypatch):
+    """Test that each message is only counted once across calls."""
+    counted = []
+
+    def count(messages):
+        counted.extend(messages)
+        return 5
+
+    monkeypatch.setattr(conversation_summary, "count_tokens_approximately", count)
+    counter = TokenCounter()
+    messages = [HumanMessage(content="hi", id="1"), AIMessage(content="yo", id="2")]
+    assert counter.count(messages) == 10
+    assert counter.count(messages + [HumanMessage(content="x", id="3")]) == 15
+    assert len(counted) == 3
+
+
+def test_summary_applied_on_next_turn():
+    """Test that a summary computed after a turn is used by the next one."""
+    store = SummaryStore()
+    middleware = make_middleware(store)
+    model = RecordingModel(
+        messages=iter([AIMessage(content=f"answer {i}") for i in range(3)])
+    )
+    model.calls = []
+    agent = create_agent(
+        model=model, middleware=[middleware], checkpointer=InMemorySaver()
+    )
+    config = {"configurable": {"thread_id": "travel"}}
+
+    def turn(text):
+        asyncio.run(
+            agent.ainvoke({"messages": [{"role": "user", "content": text}]}, config)
+        )
+
+    turn("first question about Kyoto temples " * 5)
+    turn("second question about Osaka food " * 5)
+    assert wait_for(lambda: store.get("session:travel").covered)
+
+    summary = store.get("session:travel")
+    assert len(summary.covered) == 2
+    assert len(model.calls[1]) == 3
+
+    turn("third question")
+    sent = model.calls[2]
+    assert sent[0].content == SUMMARY_PREFIX + "summary 1"
+    assert [message.content for message in sent[1:]] == [
+        "second question about Osaka food " * 5,
+        "answer 1",
+        "third question",
+    ]
+
+
+def test_update_folds_only_new_messages():
+    """Test that an update folds only the new messages into the summary."""
+    store = SummaryStore()
+    middleware = make_middleware(store)
+    messages = [HumanMessage(content=f"message {i} " * 10, id=str(i)) for i in range(6)]
+    store.put("key", Summary(text="old", covered=["0", "1"], tokens=1))
+    store.begin("key")
+
+    asyncio.run(middleware.update("key", messages))
+
+    prompt = middleware.model.prompts[0]
+    assert "Summary so far:\nold" in prompt
+    assert "message 2" in prompt and "message 3" in prompt
+    assert "message 1" not in prompt and "message 4" not in prompt
+    assert store.get("key").covered == ["0", "1", "2", "3"]
+    assert store.begin("key")
+
+
+def test_stale_summary_ignored():
+    """Test that a summary no longer leading the history is not applied."""
+    messages = [HumanMessage(content="a", id="1"), HumanMessage(content="b", id="2")]
+    assert covered_prefix(messages, Summary(text="s", covered=["1"])) == 1
+    assert covered_prefix(messages, Summary(text="s", covered=["9"])) == 0
+    assert covered_prefix(messages, Summary(text="s", covered=["1", "2", "3"])) == 0
+
+
+def test_cutoff_keeps_tool_results_with_call():
+    """Test that the summarized prefix never splits a tool call and its result."""
+    middleware = make_middleware(SummaryStore())
+    call = AIMessage(
+        content="",
+        id="2",
+        tool_calls=[{"name": "web_search", "args": {}, "id": "call"}],
+    )
+    messages = [
+        HumanMessage(content="q", id="1"),
+        call,
+        ToolMessage(content="r", tool_call_id="call", id="3"),
+        AIMessage(content="a", id="4"),
+    ]
+    assert middleware.cutoff(messages) == 1
+
+
+def test_summaries_persist_in_state_backend():
+    """Test that summaries survive restarts and the fullest one wins conflicts."""
+    backend = InMemoryKVBackend(latency=0.0)
+    replica = SummaryStore(backend=backend)
+    replica.put("session:travel", Summary(text="s", covered=["1", "2"], tokens=1))
+    assert backend.get("session", "summary:travel")[0]["covered"] == ["1", "2"]
+
+    restarted = SummaryStore(backend=backend)
+    assert restarted.get("session:travel").text == "s"
+
+    # A stale replica's summary covering fewer messages loses the conflict
+    stale = SummaryStore(backend=backend)
+    stale.put("session:travel", Summary(text="old", covered=["1"], tokens=1))
+    assert stale.get("session:travel").text == "s"
+    assert backend.get("session", "summary:travel")[0]["text"] == "s"
+
+
+def test_update_reads_summary_of_other_replica():
+    """Test that an update continues from a summary written by another replica."""
+    backend = InMemoryKVBackend(latency=0.0)
+    store = SummaryStore(backend=backend)
+    store.get("session:travel")
+    middleware = make_middleware(store)
+    messages = [HumanMessage(content=f"message {i} " * 10, id=str(i)) for i in range(6)]
+    SummaryStore(backend=backend).put(
+        "session:travel", Summary(text="remote", covered=["0", "1"], tokens=1)
+    )
+    store.begin("session:travel")
+
+    asyncio.run(middleware.update("session:travel", messages))
+
+    assert "Summary so far:\nremote" in middleware.model.prompts[0]
+    assert backend.get("session", "summary:travel")[0]["covered"] == [
+        "0",
+        "1",
+        "2",
+        "3",
+    ]
+
+
+class CountingBackend(InMemoryKVBackend):
+    """State backend counting its reads."""
+
+    def __init__(self):
+        super().__init__(latency=0.0)
+        self.reads = 0
+
+    def get(self, namespace, key):
+        self.reads += 1
+        return super().get(namespace, key)
+
+
+def test_model_calls_read_backend_at_most_once():
+    """Test that conversations without a summary only read the backend once."""
+    backend = CountingBackend()
+    middleware = make_middleware(SummaryStore(backend=backend))
+    messages = [HumanMessage(content="hi", id="1")]
+
+    for _ in range(5):
+        assert middleware._compact(messages) == messages
+    assert backend.reads == 1
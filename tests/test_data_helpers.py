@@ -0,0 +1,117 @@
+"""
+Unit tests for the out-of-core data helpers.
+
+These tests cover content-hash caching of parsed uploads, Parquet conversion,
+cache eviction and cleanup, column and preview reads and chunked aggregation
+with dask.
+"""
+
+import io
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.tools import data_helpers
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    """Write a small CSV and point the Parquet cache at a temporary directory."""
+    monkeypatch.setattr(
+        data_helpers,
+        "get_data_helpers_config",
+        lambda: {"cache_dir": str(tmp_path / "cache"), "block_size_mb": 0.001},
+    )
+    frame = pd.DataFrame(
+        {
+            "city": ["Kyoto", "Osaka", "Kyoto", "Tokyo"] * 250,
+            "amount": range(1000),
+        }
+    )
+    path = tmp_path / "sales.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_parsed_uploads_are_cached_by_content(csv_path):
+    """Test that the same content is converted once, whatever its source."""
+    first = data_helpers.to_parquet(csv_path)
+    upload = io.BytesIO(csv_path.read_bytes())
+    assert data_helpers.to_parquet(upload) == first
+    # A cache hit reuses the file instead of rewriting it
+    assert first.stat().st_ino == data_helpers.to_parquet(csv_path).stat().st_ino
+    assert data_helpers.row_count(csv_path) == 1000
+    assert data_helpers.schema(csv_path).names == ["city", "amount"]
+
+
+def test_column_and_preview_reads(csv_path):
+    """Test that only the requested columns and rows are returned."""
+    assert list(data_helpers.read_columns(csv_path, columns=["amount"])) == ["amount"]
+    preview = data_helpers.preview(csv_path, rows=5)
+    assert len(preview) == 5
+    assert preview["amount"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_chunked_aggregation_matches_pandas(csv_path):
+    """Test that dask aggregation gives the same result as pandas."""
+    result = data_helpers.aggregate(csv_path, by="city", agg={"amount": "sum"})
+    expected = pd.read_csv(csv_path).groupby("city").agg({"amount": "sum"})
+    pd.testing.assert_frame_equal(result.sort_index(), expected, check_index_type=False)
+
+
+def test_parquet_uploads_are_copied_batch_by_batch(csv_path):
+    """Test that Parquet uploads are streamed into the cache unchanged."""
+    parquet = data_helpers.to_parquet(csv_path)
+    upload = io.BytesIO(parquet.read_bytes())
+    upload.name = "sales.parquet"
+    upload.file_id = "upload"
+
+    copied = data_helpers.to_parquet(upload)
+
+    assert copied != parquet
+    assert data_helpers.read_columns(copied).equals(data_helpers.read_columns(parquet))
+
+
+def test_local_parquet_files_are_not_hashed(csv_path, monkeypatch):
+    """Test that a local Parquet file is used in place without reading it."""
+    parquet = data_helpers.to_parquet(csv_path)
+    local = csv_path.with_name("sales.parquet")
+    local.write_bytes(parquet.read_bytes())
+
+    def content_hash(source):
+        raise AssertionError("local Parquet files must not be hashed")
+
+    monkeypatch.setattr(data_helpers, "content_hash", content_hash)
+    assert data_helpers.to_parquet(local) == local
+
+
+def test_failed_conversion_leaves_no_partial_file(csv_path, tmp_path):
+    """Test that a CSV failing to parse midway leaves nothing in the cache."""
+    broken = tmp_path / "broken.csv"
+    broken.write_text("city,amount\n" + "Kyoto,1\n" * 500 + "Osaka,not a number\n")
+
+    with pytest.raises(pa.ArrowInvalid):
+        data_helpers.to_parquet(broken)
+    assert not list((tmp_path / "cache").glob("*.partial"))
+
+
+def test_cache_evicts_least_recently_used(csv_path, tmp_path, monkeypatch):
+    """Test that the cache is trimmed to its size limit, oldest first."""
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(
+        data_helpers,
+        "get_data_helpers_config",
+        lambda: {"cache_dir": str(cache), "block_size_mb": 0.001, "max_cache_mb": 0},
+    )
+    stale = cache / "stale.parquet"
+    cache.mkdir()
+    stale.write_bytes(b"x" * 1024)
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+
+    target = data_helpers.to_parquet(csv_path)
+
+    assert target.exists()
+    assert not stale.exists()
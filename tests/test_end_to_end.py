@@ -0,0 +1,80 @@
+"""
+End-to-end performance regression tests.
+
+These tests run the travel agent with web search and the summarizer stream
+against recorded cassettes, checking that replayed runs stay within the
+recorded latency profile. Set CASSETTE_LATENCY=1 to replay at real pace.
+"""
+
+import time
+
+import pytest
+
+from src.models.llm import create_llm_service
+from src.tools.web_search import web_search
+from src.utils.cassette import timing_profile
+from src.utils.environment import initialize_environment
+
+# Initialize environment variables for testing
+initialize_environment()
+
+# Allowed overhead of the app on top of the recorded network time
+OVERHEAD_SECONDS = 2.0
+
+
+def latency_budget(cassette) -> float:
+    """Wall-clock budget for a replayed run of a cassette."""
+    profile = timing_profile(str(cassette.path)) or {"total_seconds": 0.0}
+    return profile["total_seconds"] * cassette.latency_scale + OVERHEAD_SECONDS
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "What is the best time to visit Kyoto?",
+    ],
+)
+def test_agent_with_web_search(prompt, cassette):
+    """Test the travel agent end to end, including a web search tool call."""
+    service = create_llm_service(
+        provider="groq",
+        model="llama-3.1-8b-instant",
+        tools=[web_search],
+    )
+
+    started = time.perf_counter()
+    response = service.get_agent_response(
+        messages=[{"role": "user", "content": prompt}],
+        config={"configurable": {"thread_id": "e2e-agent"}},
+    )
+    elapsed = time.perf_counter() - started
+
+    assert isinstance(response["messages"][-1].content, str)
+    if cassette.mode == "replay":
+        assert elapsed <= latency_budget(cassette)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Streamlit is an open-source Python framework for building data apps. "
+        "It turns scripts into shareable web apps in minutes.",
+    ],
+)
+def test_summarizer_stream(text, cassette):
+    """Test the summarizer stream and its time to first token."""
+    service = create_llm_service(provider="groq", model="llama-3.1-8b-instant")
+
+    started = time.perf_counter()
+    first_token = None
+    summary = ""
+    for chunk in service.get_llm_stream(f"Summarize:\n{text}"):
+        if first_token is None and chunk.text:
+            first_token = time.perf_counter() - started
+        summary += chunk.text
+    elapsed = time.perf_counter() - started
+
+    assert summary
+    assert first_token is not None and first_token <= elapsed
+    if cassette.mode == "replay":
+        assert elapsed <= latency_budget(cassette)
@@ -0,0 +1,32 @@
+"""
+Unit tests for the shared event loop utilities.
+
+These tests cover scheduling coroutines on the process-wide event loop and
+the loop running on its own reused thread.
+"""
+
+import asyncio
+import threading
+
+from src.utils.event_loop import get_event_loop, submit
+
+
+async def _square(value: int) -> int:
+    await asyncio.sleep(0)
+    return value * value
+
+
+def test_submit_returns_coroutine_result():
+    """Test that submitted coroutines run to completion on the shared loop."""
+    assert submit(_square(4)).result(timeout=1) == 16
+
+
+def test_loop_runs_on_dedicated_thread():
+    """Test that the shared loop is reused and runs off the calling thread."""
+    loop = get_event_loop()
+    assert loop is get_event_loop()
+
+    async def _thread_name() -> str:
+        return threading.current_thread().name
+
+    assert submit(_thread_name()).result(timeout=1) != threading.current_thread().name
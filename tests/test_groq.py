@@ -5,8 +5,6 @@ These tests focus on the functionality of the Groq LLM model integration,
 including response generation and error handling.
 """
 
-from unittest.mock import patch
-
 import pytest
 
 from src.models.llm import create_llm_service
@@ -16,21 +14,18 @@ from src.utils.environment import initialize_environment
 initialize_environment()
 
 
-# Mocked version for unit testing without calling real API
+# Replayed from a recorded cassette for offline, deterministic runs
 @pytest.mark.parametrize(
     "prompt",
     [
         "Hello, how are you?",
     ],
 )
-def test_run_llm_parametrized(prompt):
-    """Test run_llm with multiple prompts using mocking."""
-    with patch("src.models.llm.create_llm_service") as mock_run:
-        mock_run.return_value = f"Response to: {prompt}"
-
-        service = create_llm_service(provider="groq", model="llama-3.1-8b-instant")
+def test_run_llm_parametrized(prompt, cassette):
+    """Test run_llm with multiple prompts against recorded responses."""
+    service = create_llm_service(provider="groq", model="llama-3.1-8b-instant")
 
-        response = service.get_llm_response(prompt)
+    response = service.get_llm_response(prompt)
 
-        assert response is not None
-        assert isinstance(response.content, str)
+    assert response is not None
+    assert isinstance(response.content, str)
@@ -0,0 +1,56 @@
+"""
+Unit tests for the background job manager.
+
+These tests cover event buffering, duplicate submission handling and the
+cancellation of abandoned jobs.
+"""
+
+import asyncio
+import time
+
+from src.utils.jobs import JobManager
+
+
+async def _events(count: int, delay: float = 0.0):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield i
+
+
+def _wait_finished(job, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_job_buffers_events_for_polling():
+    """Test that events are buffered and read incrementally."""
+    manager = JobManager()
+    job = manager.submit("session", "thread", _events(3))
+    _wait_finished(job)
+
+    assert job.status == "done"
+    assert job.read(0) == [0, 1, 2]
+    assert job.read(2) == [2]
+
+    manager.release(job)
+    assert manager.get("session", "thread") is None
+
+
+def test_duplicate_submission_reattaches_to_running_job():
+    """Test that a running job is reused instead of submitted twice."""
+    manager = JobManager()
+    job = manager.submit("session", "thread", _events(2, delay=0.2))
+    duplicate = manager.submit("session", "thread", _events(2))
+
+    assert duplicate is job
+    manager.cancel(job)
+
+
+def test_abandoned_job_is_cancelled():
+    """Test that jobs nobody polls are cancelled by the reaper."""
+    manager = JobManager(abandon_timeout=0.05, reap_interval=0.05)
+    job = manager.submit("session", "thread", _events(100, delay=0.1))
+    _wait_finished(job)
+
+    assert job.status == "cancelled"
@@ -0,0 +1,146 @@
+"""
+Unit tests for speculative web search prefetching.
+
+These tests cover serving a matching tool call from the prefetch of its turn,
+falling back to a normal search on mismatches, the bound on searches in
+flight and the accounting of unused prefetches.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.tools import web_search as web_search_module
+from src.tools.web_search import SearchPrefetcher, web_search
+
+
+class FakeSearch:
+    """Search stand-in recording its queries."""
+
+    def __init__(self):
+        self.queries = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, query, limit=5):
+        self.queries.append(query)
+        self.release.wait()
+        return {"query": query, "results": [{"content": f"about {query}"}] * limit}
+
+
+class ToolCallingModel(GenericFakeChatModel):
+    """Fake chat model that accepts tools."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@pytest.fixture
+def prefetcher(monkeypatch):
+    """Prefetcher with a fake search, also used by the web_search tool."""
+    search = FakeSearch()
+    prefetcher = SearchPrefetcher(search, max_inflight=1)
+    monkeypatch.setattr(web_search_module, "run_search", search)
+    monkeypatch.setattr(web_search_module, "get_search_prefetcher", lambda: prefetcher)
+    return prefetcher
+
+
+def run_turn(prefetcher, prompt, tool_query):
+    """Run an agent turn that searches once and then answers."""
+    model = ToolCallingModel(
+        messages=iter(
+            [
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {"name": "web_search", "args": {"query": tool_query}, "id": "1"}
+                    ],
+                ),
+                AIMessage(content="Visit in spring."),
+            ]
+        )
+    )
+    agent = create_agent(model=model, tools=[web_search])
+    stream = agent.astream(
+        {"messages": [{"role": "user", "content": prompt}]}, stream_mode="updates"
+    )
+
+    async def consume():
+        return [event async for event in prefetcher.wrap(prompt, stream)]
+
+    return asyncio.run(consume())
+
+
+def test_matching_tool_call_served_from_prefetch(prefetcher):
+    """Test that a tool query matching the prompt reuses the prefetched search."""
+    run_turn(
+        prefetcher, "What is the best time to visit Kyoto?", "Kyoto best time visit"
+    )
+
+    assert prefetcher.search.queries == ["What is the best time to visit Kyoto?"]
+    assert prefetcher.stats()["served"] == 1
+
+
+def test_mismatched_tool_call_searches_normally(prefetcher):
+    """Test that an unrelated tool query searches and the prefetch is unused."""
+    run_turn(prefetcher, "What is the best time to visit Kyoto?", "Osaka street food")
+
+    assert prefetcher.search.queries == [
+        "What is the best time to visit Kyoto?",
+        "Osaka street food",
+    ]
+    stats = prefetcher.stats()
+    assert stats["mismatched"] == 1 and stats["unused"] == 1
+    assert "served" not in stats
+
+
+def test_no_prefetch_outside_turn(prefetcher):
+    """Test that tool calls outside a prefetching turn always search."""
+    assert prefetcher.claim("Kyoto") is None
+
+
+def test_inflight_prefetches_bounded(prefetcher):
+    """Test that prefetches beyond the in-flight bound are skipped, not queued."""
+    prefetcher.search.release.clear()
+    first = prefetcher.start("Kyoto")
+    assert first is not None
+    assert prefetcher.start("Osaka") is None
+    assert prefetcher.stats()["skipped"] == 1
+
+    prefetcher.search.release.set()
+    first.future.result(timeout=1)
+    assert prefetcher.start("Osaka") is not None
+
+
+def test_turn_ending_before_prefetch_starts_frees_slot(prefetcher):
+    """Test that a prefetch cancelled before it ran frees its slot."""
+    # Keep the only worker busy so that the prefetch stays queued
+    busy = threading.Event()
+    blocker = prefetcher._executor.submit(busy.wait)
+    prefetch = prefetcher.start("Kyoto")
+    assert prefetch is not None
+
+    prefetcher.finish(prefetch)
+    busy.set()
+    blocker.result(timeout=1)
+
+    assert prefetch.future.cancelled()
+    assert prefetcher.stats()["cancelled"] == 1
+    later = prefetcher.start("Osaka")
+    assert later is not None
+    later.future.result(timeout=1)
+    assert prefetcher.search.queries == ["Osaka"]
+
+
+def test_match_threshold():
+    """Test that only tool queries mostly in the prefetched prompt match."""
+    prefetcher = SearchPrefetcher(FakeSearch(), match_threshold=0.6)
+    prefetch = prefetcher.start("Things to do in Kyoto in April", limit=5)
+
+    assert prefetcher.match("Kyoto April things", prefetch) == 1.0
+    assert prefetcher.match("Kyoto hotels prices", prefetch) < 0.6
+    prefetch.future.result(timeout=1)
@@ -0,0 +1,154 @@
+"""
+Unit tests for the per-rerun sampling profiler.
+
+These tests cover profiles being written once the profiled frame returns,
+the pstats output loading with the standard library, rotation of old
+profiles, the query parameter opt-in and the attribution of samples to our
+modules.
+"""
+
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from src.utils import profiling
+from src.utils.profiling import (
+    ROOT,
+    RunProfiler,
+    component,
+    profile_fragment,
+    profile_page,
+)
+
+
+def busy(seconds):
+    """Spin in Python code so the sampler sees this frame."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profiled_run(profiler):
+    """Stand-in for a page script: profile this frame while busy."""
+    profiler.start(sys._getframe())
+    busy(0.1)
+
+
+def wait_for(directory, pattern, timeout=2.0):
+    """Wait for the sampler thread to write its output."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        files = list(directory.glob(pattern))
+        if files:
+            return files
+        time.sleep(0.01)
+    return []
+
+
+def test_profile_written_when_run_ends(tmp_path):
+    """Test that folded stacks and pstats are written after the root frame returns."""
+    profiler = RunProfiler("page", interval=0.002, output_dir=str(tmp_path))
+    profiled_run(profiler)
+
+    folded = wait_for(tmp_path, "page_*.folded")
+    assert len(folded) == 1
+    assert wait_for(tmp_path, "page_*.pstats")
+    lines = folded[0].read_text().splitlines()
+    assert any("tests.test_profiling:profiled_run;" in line for line in lines)
+    assert any(
+        line.split(";")[-1].startswith("tests.test_profiling:busy ") for line in lines
+    )
+
+
+def test_pstats_loads(tmp_path):
+    """Test that the pstats file is readable with the standard library."""
+    profiler = RunProfiler("page", interval=0.002, output_dir=str(tmp_path))
+    profiled_run(profiler)
+
+    stats = pstats.Stats(str(wait_for(tmp_path, "page_*.pstats")[0]))
+    busy_stats = [
+        value for key, value in stats.stats.items() if key[2] == "busy"  # type: ignore[attr-defined]
+    ]
+    assert busy_stats and busy_stats[0][3] > 0.05
+
+
+def test_component_names():
+    """Test that our files are named by module and dependencies by package."""
+    assert component(str(ROOT / "src" / "models" / "llm.py")) == "src.models.llm"
+    assert component("<string>") == "generated code"
+    assert (
+        component("/usr/lib/python3/site-packages/streamlit/runtime/x.py")
+        == "streamlit"
+    )
+
+
+def test_attribution_to_innermost_own_frame():
+    """Test that dependency time counts toward the module of ours calling it."""
+    profiler = RunProfiler("page", interval=0.01, output_dir="unused")
+    page = (str(ROOT / "Home.py"), 1, "<module>")
+    llm = (str(ROOT / "src" / "models" / "llm.py"), 10, "invoke")
+    httpx = ("/venv/lib/site-packages/httpx/_client.py", 5, "send")
+    streamlit = ("/venv/lib/site-packages/streamlit/elements/write.py", 5, "write")
+    profiler.samples = Counter(
+        {(page, llm, httpx): 3, (page, streamlit): 1, (streamlit,): 1}
+    )
+
+    assert profiler.attribution() == {
+        "src.models.llm": 0.6,
+        "Home": 0.2,
+        "streamlit": 0.2,
+    }
+
+
+def test_old_profiles_rotated(tmp_path):
+    """Test that only the most recent runs are kept in the output directory."""
+    for _ in range(3):
+        profiler = RunProfiler(
+            "page", interval=0.002, output_dir=str(tmp_path), max_runs=2
+        )
+        profiled_run(profiler)
+        for thread in threading.enumerate():
+            if thread.name == "profiler-page":
+                thread.join()
+
+    assert len(list(tmp_path.glob("page_*.folded"))) == 2
+    assert len(list(tmp_path.glob("page_*.pstats"))) == 2
+
+
+def test_query_param_needs_config_opt_in(monkeypatch):
+    """Test that ?profile=1 only profiles when the configuration allows it."""
+    started = []
+    monkeypatch.setattr(profiling.st, "query_params", {"profile": "1"})
+    monkeypatch.setattr(RunProfiler, "start", lambda self, root: started.append(1))
+
+    monkeypatch.setattr(profiling, "get_profiling_config", lambda: {})
+    profile_page("page")
+    assert not started
+
+    monkeypatch.setattr(
+        profiling, "get_profiling_config", lambda: {"allow_query_param": True}
+    )
+    profile_page("page")
+    assert started
+
+
+def test_fragments_profiled_only_when_rerun_alone(monkeypatch):
+    """Test that a fragment is profiled on its own reruns, not within others."""
+    started = []
+    monkeypatch.setattr(RunProfiler, "start", lambda self, root: started.append(1))
+    monkeypatch.setattr(profiling, "get_profiling_config", lambda: {"enabled": True})
+
+    def run(current, rerun):
+        ctx = SimpleNamespace(current_fragment_id=current, fragment_ids_this_run=rerun)
+        monkeypatch.setattr(profiling, "get_script_run_ctx", lambda **_: ctx)
+        profile_fragment("page.fragment")
+
+    run("chat", None)
+    run("poll", ["chat"])
+    assert not started
+
+    run("chat", ["chat"])
+    assert started == [1]
@@ -0,0 +1,72 @@
+"""
+Unit tests for the semantic cache.
+
+These tests cover paraphrase hits, the destination and qualifier guards,
+near-miss variants, TTL expiry and per-destination invalidation.
+"""
+
+import time
+
+from src.models.semantic_cache import SemanticCache, extract_destination
+
+
+def test_extract_destination_ignores_generic_travel_terms():
+    """Test that only destination terms are extracted from a prompt."""
+    assert extract_destination("Best time to visit Kyoto") == {"kyoto"}
+    assert extract_destination("when should i go to kyoto") == {"kyoto"}
+
+
+def test_paraphrase_is_served_from_cache():
+    """Test that a close paraphrase hits the cached answer."""
+    cache = SemanticCache()
+    cache.store("best time to visit Kyoto", "Spring and autumn.")
+
+    hit = cache.lookup("When should I go to Kyoto?")
+
+    assert hit is not None
+    assert hit.answer == "Spring and autumn."
+    assert cache.metrics()["hit_rate"] == 1.0
+
+
+def test_other_destination_or_topic_misses():
+    """Test that similar questions about other places or topics miss."""
+    cache = SemanticCache()
+    cache.store("best time to visit Kyoto", "Spring and autumn.")
+
+    assert cache.lookup("best time to visit Osaka") is None
+    assert cache.lookup("food to eat in Kyoto") is None
+
+
+def test_expired_and_invalidated_entries_miss():
+    """Test that stale or invalidated answers are never served."""
+    cache = SemanticCache(ttl=0.01)
+    cache.store("best time to visit Kyoto", "Spring and autumn.")
+    time.sleep(0.05)
+    assert cache.lookup("best time to visit Kyoto") is None
+
+    cache = SemanticCache()
+    cache.store("best time to visit Kyoto", "Spring and autumn.")
+    assert cache.invalidate("Kyoto") == 1
+    assert cache.lookup("best time to visit Kyoto") is None
+
+
+def test_qualified_near_misses_miss():
+    """Test that negated, seasonal or party-specific variants are not served."""
+    cache = SemanticCache()
+    cache.store("best time to visit Kyoto", "Spring and autumn.")
+
+    assert cache.lookup("worst time to visit Kyoto") is None
+    assert cache.lookup("best time to visit Kyoto in winter") is None
+    assert cache.lookup("best time to visit Kyoto with kids") is None
+    assert cache.lookup("When should I not go to Kyoto?") is None
+
+
+def test_matching_qualifiers_hit():
+    """Test that paraphrases with the same qualifiers are still served."""
+    cache = SemanticCache()
+    cache.store("best time to visit Kyoto with kids", "Spring, avoiding holidays.")
+
+    hit = cache.lookup("When should I go to Kyoto with kids?")
+
+    assert hit is not None
+    assert hit.answer == "Spring, avoiding holidays."
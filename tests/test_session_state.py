@@ -0,0 +1,245 @@
+"""
+Unit tests for the session state manager.
+
+These tests cover spilling idle sessions to disk, enforcing the global memory
+budget, restoring evicted state when a session returns, syncing state
+between replicas through a shared store and resuming from resume tokens.
+"""
+
+import asyncio
+import threading
+import time
+
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.utils import session_state
+from src.utils.session_state import (
+    SessionStateManager,
+    SessionStore,
+    approximate_size,
+)
+from src.utils.state_backend import InMemoryKVBackend
+
+
+class ToolCallingModel(GenericFakeChatModel):
+    """Fake chat model that accepts tools."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool(response_format="content_and_artifact")
+def fake_search(query: str):
+    """Search stand-in returning compacted content and a raw artifact."""
+    return f"about {query}", {"results": [{"url": "https://example.com"}]}
+
+
+def _agent_chunks() -> list:
+    """Stream chunks of a real agent turn that calls a tool."""
+    model = ToolCallingModel(
+        messages=iter(
+            [
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {"name": "fake_search", "args": {"query": "Kyoto"}, "id": "1"}
+                    ],
+                ),
+                AIMessage(content="Visit in spring."),
+            ]
+        )
+    )
+    agent = create_agent(model=model, tools=[fake_search])
+    stream = agent.astream(
+        {"messages": [{"role": "user", "content": "Kyoto"}]}, stream_mode="updates"
+    )
+
+    async def consume():
+        return [chunk async for chunk in stream]
+
+    return asyncio.run(consume())
+
+
+def _session_state() -> dict:
+    saver = InMemorySaver()
+    saver.storage["thread"][""]["checkpoint"] = ("type", b"payload", None)
+    return {
+        "session_id": "session",
+        "checkpointer": saver,
+        "page_1_messages": [{"role": "user", "content": "x" * 1000}],
+    }
+
+
+def test_approximate_size_counts_nested_values():
+    """Test that nested containers contribute to the measured size."""
+    small = approximate_size({"messages": ["x"]})
+    large = approximate_size({"messages": ["x" * 10_000]})
+    assert large - small > 9_000
+
+
+def test_idle_session_is_spilled_and_restored(tmp_path):
+    """Test that idle sessions release their state and get it back on return."""
+    manager = SessionStateManager(idle_timeout=0.01, spill_dir=str(tmp_path))
+    state = _session_state()
+    manager.touch("session", state)
+
+    time.sleep(0.05)
+    manager.sweep()
+
+    assert state["page_1_messages"] == []
+    assert not state["checkpointer"].storage
+    assert manager.metrics()["evictions"] == 1
+
+    manager.touch("session", state)
+
+    assert state["page_1_messages"][0]["content"] == "x" * 1000
+    assert state["checkpointer"].storage["thread"][""]["checkpoint"][1] == b"payload"
+    assert manager.metrics()["restores"] == 1
+
+
+def test_budget_evicts_least_recently_used_sessions(tmp_path):
+    """Test that sessions are evicted oldest first until under budget."""
+    manager = SessionStateManager(
+        memory_budget_mb=0.0001, min_idle=0.0, spill_dir=str(tmp_path)
+    )
+    older, newer = _session_state(), _session_state()
+    manager.touch("older", older)
+    manager.touch("newer", newer)
+
+    manager.sweep(exclude="newer")
+
+    assert older["page_1_messages"] == []
+    assert newer["page_1_messages"]
+    assert manager.metrics()["budget_evictions"] == 1
+
+
+def test_sessions_in_a_script_run_are_not_evicted(tmp_path, monkeypatch):
+    """Test that a session is only evicted once its script run has ended."""
+    monkeypatch.setattr(session_state, "get_script_run_ctx", lambda **_: object())
+    manager = SessionStateManager(idle_timeout=0.01, spill_dir=str(tmp_path))
+    state = _session_state()
+    finish_run = threading.Event()
+
+    def script_run():
+        manager.touch("session", state)
+        finish_run.wait()
+
+    run = threading.Thread(target=script_run)
+    run.start()
+    time.sleep(0.05)
+    manager.sweep()
+    assert state["page_1_messages"]
+
+    finish_run.set()
+    run.join()
+    manager.sweep()
+    assert state["page_1_messages"] == []
+    assert manager.metrics()["evictions"] == 1
+
+
+def test_replicas_share_state_through_store():
+    """Test that a session resumes on another replica and merges conflicts."""
+    store = SessionStore(InMemoryKVBackend(latency=0.0), refresh_interval=0.0)
+    replica_a = _session_state()
+    store.persist("session", replica_a)
+
+    # A second replica picks the session up from the shared store
+    replica_b = {"session_id": "session", "checkpointer": InMemorySaver()}
+    store.refresh("session", replica_b)
+    assert replica_b["page_1_messages"] == replica_a["page_1_messages"]
+    assert "checkpoint" in replica_b["checkpointer"].storage["thread"][""]
+
+    # Both replicas append concurrently; the later write merges the earlier one
+    replica_a["page_1_messages"].append({"role": "assistant", "content": "a"})
+    replica_b["page_1_messages"].append({"role": "assistant", "content": "b"})
+    store.persist("session", replica_a)
+    store.persist("session", replica_b)
+    assert [m["content"] for m in replica_b["page_1_messages"][1:]] == ["a", "b"]
+
+    store.refresh("session", replica_a)
+    assert replica_a["page_1_messages"] == replica_b["page_1_messages"]
+
+
+def test_replicas_keep_their_own_spill_files(tmp_path):
+    """Test that a second process on the same host leaves live spill files alone."""
+    first = SessionStateManager(idle_timeout=0.01, spill_dir=str(tmp_path))
+    state = _session_state()
+    first.touch("session", state)
+    time.sleep(0.05)
+    first.sweep()
+
+    second = SessionStateManager(idle_timeout=0.01, spill_dir=str(tmp_path))
+    second.touch("session", _session_state())
+    time.sleep(0.05)
+    second.sweep()
+    second.close()
+
+    first.touch("session", state)
+    assert state["page_1_messages"][0]["content"] == "x" * 1000
+
+
+def test_failed_restore_pulls_state_from_store(tmp_path):
+    """Test that state lost with its spill file is pulled back, not overwritten."""
+    store = SessionStore(InMemoryKVBackend(latency=0.0), refresh_interval=60.0)
+    manager = SessionStateManager(idle_timeout=0.01, spill_dir=str(tmp_path))
+    state = _session_state()
+    store.persist("session", state)
+    manager.touch("session", state)
+    time.sleep(0.05)
+    manager.sweep()
+    manager.close()
+
+    manager.touch("session", state)
+    store.persist("session", state)
+    assert store.backend.get("session", "page_1_messages")[1] == 1
+
+    store.refresh("session", state)
+    assert state["page_1_messages"][0]["content"] == "x" * 1000
+
+
+def test_resume_token_copies_state_into_new_session():
+    """Test that a resume link copies the state without sharing the session ID."""
+    store = SessionStore(InMemoryKVBackend(latency=0.0), refresh_interval=0.0)
+    original = _session_state()
+    store.persist("session", original)
+    summary = {"text": "summary", "covered": ["1"], "tokens": 1}
+    store.backend.put("session", "summary:thread", summary, 0)
+    token = store.issue_token("session")
+    assert "session" not in token
+
+    copy = {"session_id": "copy"}
+    assert store.resume(token, copy)
+    assert copy["page_1_messages"] == original["page_1_messages"]
+    assert "checkpoint" in copy["checkpointer"].storage["thread"][""]
+    assert store.backend.get("copy", "summary:thread")[0] == summary
+
+    # The copy persists under its own ID and leaves the original untouched
+    copy["page_1_messages"].append({"role": "assistant", "content": "copy"})
+    store.persist("copy", copy)
+    assert len(store.backend.get("copy", "page_1_messages")[0]) == 2
+    assert len(store.backend.get("session", "page_1_messages")[0]) == 1
+
+    assert not store.resume("unknown", {"session_id": "other"})
+
+
+def test_resume_copies_agent_chunks():
+    """Test that chat history holding agent tool chunks persists and resumes."""
+    store = SessionStore(InMemoryKVBackend(latency=0.0), refresh_interval=0.0)
+    chunks = _agent_chunks()
+    original = {
+        "session_id": "session",
+        "page_2_messages": [{"role": "tools", "content": chunk} for chunk in chunks],
+    }
+    store.persist("session", original)
+    assert "page_2_messages" in original["state_versions"]
+
+    copy = {"session_id": "copy"}
+    assert store.resume(store.issue_token("session"), copy)
+    assert copy["page_2_messages"] == original["page_2_messages"]
+    tool_message = copy["page_2_messages"][1]["content"]["tools"]["messages"][0]
+    assert isinstance(tool_message, ToolMessage)
+    assert tool_message.artifact == {"results": [{"url": "https://example.com"}]}
@@ -0,0 +1,93 @@
+"""
+Unit tests for the shared state backends.
+
+These tests cover versioned writes and optimistic concurrency conflicts for
+the SQLite and in-memory key-value backends, conflict merging, expiry and
+the data-only value encoding.
+"""
+
+import time
+
+import pytest
+
+from src.utils.state_backend import (
+    InMemoryKVBackend,
+    SQLiteStateBackend,
+    VersionConflictError,
+    decode,
+    encode,
+)
+
+
+@pytest.fixture(params=["sqlite", "kv"])
+def backend(request, tmp_path):
+    """Run each test against both backends."""
+    if request.param == "sqlite":
+        return SQLiteStateBackend(path=str(tmp_path / "state.db"))
+    return InMemoryKVBackend(latency=0.0)
+
+
+def test_versioned_put_and_get(backend):
+    """Test that every write bumps the version of the stored value."""
+    assert backend.get("session", "messages") == (None, 0)
+    assert backend.put("session", "messages", ["a"], expected_version=0) == 1
+    assert backend.put("session", "messages", ["a", "b"], expected_version=1) == 2
+    assert backend.get("session", "messages") == (["a", "b"], 2)
+    assert backend.versions("session") == {"messages": 2}
+
+
+def test_stale_write_conflicts(backend):
+    """Test that a write based on an outdated version is rejected."""
+    backend.put("session", "messages", ["a"], expected_version=0)
+    backend.put("session", "messages", ["a", "b"], expected_version=1)
+
+    with pytest.raises(VersionConflictError):
+        backend.put("session", "messages", ["a", "c"], expected_version=1)
+    with pytest.raises(VersionConflictError):
+        backend.put("session", "messages", ["c"], expected_version=0)
+
+
+def test_update_merges_concurrent_writes(backend):
+    """Test that update re-reads and merges when another replica wrote first."""
+    backend.put("session", "messages", ["a"], expected_version=0)
+    backend.put("session", "messages", ["a", "b"], expected_version=1)
+
+    value, version = backend.update(
+        "session",
+        "messages",
+        lambda remote: remote + ["c"],
+        expected_version=1,
+        value=["a", "c"],
+    )
+    assert value == ["a", "b", "c"]
+    assert backend.get("session", "messages") == (["a", "b", "c"], version)
+
+
+def test_purge_removes_idle_namespaces(backend):
+    """Test that namespaces not written within the TTL are deleted."""
+    backend.put("old", "messages", ["a"], expected_version=0)
+    time.sleep(0.05)
+    backend.put("new", "messages", ["b"], expected_version=0)
+
+    assert backend.purge(max_age=0.03) == 1
+    assert backend.get("old", "messages") == (None, 0)
+    assert backend.get("new", "messages") == (["b"], 1)
+
+
+def test_encoding_round_trips_checkpoint_data(backend):
+    """Test that bytes, tuples and non-string dict keys survive a round trip."""
+    value = {
+        "storage": {"thread": {"": {"id": ("json", b"\x00payload", None)}}},
+        "writes": {("thread", "", "id"): {("task", 0): ("task", "ch", 1)}},
+        "tagged": {"__bytes__": "not bytes"},
+    }
+    backend.put("session", "checkpointer", value, expected_version=0)
+    assert backend.get("session", "checkpointer") == (value, 1)
+
+
+def test_encoding_rejects_objects():
+    """Test that only plain data is stored, so reading a store never runs code."""
+    with pytest.raises(TypeError):
+        encode({"value": object()})
+    with pytest.raises(ValueError):
+        decode(b"\x80\x04K\x01.")
@@ -0,0 +1,46 @@
+"""
+Unit tests for incremental tag parsing of streamed model output.
+
+These tests cover blocks and tags split across chunks, several blocks in one
+stream and text outside of tags being ignored.
+"""
+
+from src.utils.stream_parser import TagStreamParser
+
+
+def feed_all(parser, chunks):
+    """Feed every chunk and collect the emitted blocks in order."""
+    blocks = []
+    for chunk in chunks:
+        blocks.extend(parser.feed(chunk))
+    return blocks
+
+
+def test_block_in_single_chunk():
+    """A complete block in one chunk is emitted immediately"""
+    parser = TagStreamParser("execute_python")
+    assert parser.feed("intro <execute_python>x = 1</execute_python> outro") == [
+        "x = 1"
+    ]
+
+
+def test_tags_split_across_chunks():
+    """Opening and closing tags split over chunk boundaries are still found"""
+    parser = TagStreamParser("execute_python")
+    text = "Here you go <execute_python>print('hi')</execute_python> done"
+    chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+    assert feed_all(parser, chunks) == ["print('hi')"]
+
+
+def test_block_emitted_when_closed():
+    """A block is emitted by the chunk carrying its closing tag, not later"""
+    parser = TagStreamParser("execute_python")
+    assert parser.feed("<execute_python>a = 1\n") == []
+    assert parser.feed("b = 2</execute_python><execute_python>c") == ["a = 1\nb = 2"]
+    assert parser.feed(" = 3</execute_python>") == ["c = 3"]
+
+
+def test_text_outside_tags_ignored():
+    """Text without tags never produces blocks"""
+    parser = TagStreamParser("execute_python")
+    assert feed_all(parser, ["no code ", "here <execute", "_py"]) == []